@@ -1,5 +1,5 @@
-from PIL import Image
-import numpy as np
+import sys
+sys.path.append("..")
+import dem
 
-im = Image.open("map.png")
-height = np.array(im)
\ No newline at end of file
+height = dem.Load("map.png")
@@ -0,0 +1,475 @@
+#
+# 10/18/26
+# ---------------------------------------- Benchmarks ----------------------------------------
+"""
+Timing the erosion engines against each other & a fixed-seed suite to catch regressions.
+Run with: python benchmark.py [engines | tiled | precision | gradient | suite results.json | compare baseline.json results.json |
+    quality | spawn | multires]
+"""
+# The suite times noise.Perlin, noise.Octave & erosion (the engine parameters.py selects) at each
+# resolution and drop count, recording wall time, drops/sec, steps/sec & peak memory to JSON.
+# Peak memory is the rise in the process high-water mark (VmHWM) over the RSS before the run,
+# which only resets per run on Linux. Compare flags results slower or bigger than the baseline
+# by more than the threshold.
+#
+# Quality erodes the same map with nearest & bilinear drop_sampling and measures the terrain after
+# each drop count (channel depth, roughness & pits, see _quality), to see how many drops bilinear
+# sampling saves for channels as deep as nearest sampling carves. Spawn does the same for every
+# rain_distribution against uniform rain. Multires times coarse-to-fine erosion (multires.py) against
+# a single level run on the same map & drop budget. Gradient times the incremental gradient updates
+# of the reference engine (gradient.py) against a full np.gradient before every drop.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import numpy as np
+from scipy import ndimage
+import noise
+import engine
+import kernels
+import tiled
+import pipe
+import erosion
+import multires
+import streams
+import instrument
+import settings
+import parameters as param
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Engine Throughput ----------------------------------------
+
+def Engines(resolution = 256, num_drops = 2000, batch_sizes = (64, 512, 4096), p = param):
+    """
+    Prints drops/sec of the reference loop, the numba backend, the batched engine at each batch size and the pipe model
+    on the same map & drops. The pipe model's steps are timesteps.
+    """
+    base = noise.Octave(resolution, p.noise_octaves, p.noise_lacunarity, p.noise_persistance, p.map_seed)[1:-2, 1:-2]
+    drops = (resolution - 3) * streams.Rain(p.rain_seed, 0, num_drops)
+
+    runs = [('reference', lambda ermap: engine.Erode(ermap, drops, p))]
+    if kernels.available:
+        engine.Backend('numba')(base.copy(), drops[:10], p) # compiling
+        runs.append(('numba', lambda ermap: engine.Backend('numba')(ermap, drops, p)))
+    for size in batch_sizes:
+        runs.append(('batch %d' % size, lambda ermap, size = size: engine.ErodeBatch(ermap, drops, p, size)))
+    runs.append(('pipe', lambda ermap: pipe.Erode(ermap, drops, p)))
+
+    results = {}
+    for name, run in runs:
+        ermap = base.copy()
+        start = time.perf_counter()
+        steps = run(ermap)
+        elapsed = time.perf_counter() - start
+        results[name] = num_drops / elapsed
+        print('%-12s %10.0f drops/sec %12.0f steps/sec' % (name, num_drops / elapsed, steps / elapsed))
+    return results
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Tiled Scaling ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Tiled(resolution = 1024, num_drops = 20000, process_counts = (1, 2, 4, 8), p = param):
+    """
+    Prints drops/sec of tiled.Erode for each process count, with speedup over a single process, and checks the tile
+    seams against a serial run: the mean erosion within 2 cells of any round's tile edges over the mean elsewhere
+    should be about the same for both.
+    """
+    base = noise.Octave(resolution, p.noise_octaves, p.noise_lacunarity, p.noise_persistance, p.map_seed)[1:-2, 1:-2]
+    drops = (resolution - 3) * streams.Rain(p.rain_seed, 0, num_drops)
+    seams = _seams(base.shape, p.tile_size, p.tile_rounds)
+
+    def seam_ratio(ermap):
+        change = np.abs(ermap - base)
+        return change[seams].mean() / change[~seams].mean()
+
+    serial = base.copy()
+    engine.Backend(p.drop_backend)(serial, drops, p)
+    print('serial       seam ratio %.2f' % seam_ratio(serial))
+
+    results = {}
+    for processes in process_counts:
+        ermap = base.copy()
+        start = time.perf_counter()
+        tiled.Erode(ermap, drops, p, processes)
+        elapsed = time.perf_counter() - start
+        results[processes] = num_drops / elapsed
+        print('%2d processes %10.0f drops/sec %6.2fx  seam ratio %.2f' % (processes, results[processes],
+            results[processes] / results[process_counts[0]], seam_ratio(ermap)))
+    return results
+
+
+def _seams(shape, tile_size, rounds):
+    # Cells within 2 of a tile edge of any round of tiled.Erode
+    near = np.zeros(shape, bool)
+    for k in range(rounds):
+        for axis, size in enumerate(shape):
+            for edge in range(tile_size - k * tile_size // rounds, size, tile_size):
+                near[(slice(None),) * axis + (slice(max(edge - 2, 0), edge + 2),)] = True
+    return near
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Precision ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Precision(resolution = 512, num_drops = 5000, p = param):
+    """
+    Prints runtime of noise & erosion in float64 and float32 and the error of the float32 maps.
+    """
+    drops = (resolution - 3) * streams.Rain(p.rain_seed, 0, num_drops)
+    erode = engine.Backend(p.drop_backend)
+
+    maps = {}
+    for dtype in (np.float64, np.float32):
+        start = time.perf_counter()
+        base = noise.Octave(resolution, p.noise_octaves, p.noise_lacunarity, p.noise_persistance, p.map_seed, dtype = dtype)[1:-2, 1:-2]
+        noise_time = time.perf_counter() - start
+        erode(base.copy(), drops[:10], p) # compiling, for the numba backend
+        ermap = base.copy()
+        start = time.perf_counter()
+        erode(ermap, drops, p)
+        erode_time = time.perf_counter() - start
+        maps[dtype] = base, ermap
+        print('%-8s noise %7.3f s  erosion %7.3f s  %7.1f MB per map' % (np.dtype(dtype).name, noise_time, erode_time, ermap.nbytes / 2 ** 20))
+
+    for name, i in (('noise', 0), ('eroded', 1)):
+        error = np.abs(maps[np.float64][i] - maps[np.float32][i])
+        print('float32 %-6s error: max %.3g, mean %.3g (heights 0-255)' % (name, error.max(), error.mean()))
+    change = np.abs(maps[np.float64][1] - maps[np.float64][0]).mean()
+    print('mean erosion depth in float64: %.3g' % change)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Gradient ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Gradient(resolution = 256, num_drops = 1000, p = param):
+    """
+    Prints the gradient time per drop of the reference engine, updating only the touched cells, against a full
+    np.gradient of the map per drop. Returns (incremental, full) seconds per drop.
+    """
+    q = settings.Namespace(p, terrain_reolution = resolution)
+    base = erosion.Terrain(q)
+    drops = (resolution - 3) * streams.Rain(q.rain_seed, 0, num_drops)
+    stats = instrument.Recorder()
+    ermap = np.array(base)
+    engine.Erode(ermap, drops, q, stats = stats)
+    incremental = stats.timers['gradient'] / num_drops
+
+    start = time.perf_counter()
+    for _ in range(num_drops):
+        np.gradient(ermap)
+    full = (time.perf_counter() - start) / num_drops
+    print('%d x %d  incremental %7.3f ms/drop  full np.gradient %7.3f ms/drop  %5.1fx' % (resolution, resolution,
+        1000 * incremental, 1000 * full, full / incremental))
+    return incremental, full
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Suite ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+# Noise is fast enough to time best-of-N, peak memory changes under the slack are noise
+_NOISE_REPEATS = 5
+_MEMORY_SLACK = 2 ** 20
+
+
+def _rss():
+    # Current resident set size in bytes (Linux), 0 where /proc isn't available
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _measure(run, repeat = 1):
+    # (best seconds, peak bytes) of repeat calls of run()
+    best, peak = float('inf'), 0
+    for _ in range(repeat):
+        noise._reset_peak_rss()
+        before = _rss()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+        peak = max(peak, noise._peak_rss() - before)
+    return best, peak
+
+
+def Suite(resolutions = (128, 256, 1024, 4096), drop_counts = (1000, 5000), output = None, p = param):
+    """
+    Times Perlin, Octave & erosion at every resolution & drop count with fixed seeds. Returns the results
+    (& writes them to output as JSON) keyed like 'octave 256' or 'erosion 256 1000'.
+    """
+    results = {}
+
+    def record(name, elapsed, peak, drops = None, steps = None):
+        entry = {'wall': elapsed, 'peak_memory': peak}
+        if drops is not None:
+            entry['drops_per_sec'] = drops / elapsed
+            entry['steps_per_sec'] = steps / elapsed
+        results[name] = entry
+        print('%-22s %9.3f s %9.1f MB' % (name, elapsed, peak / 2 ** 20)
+            + ('' if drops is None else ' %10.0f drops/sec %12.0f steps/sec' % (entry['drops_per_sec'], entry['steps_per_sec'])))
+
+    grid = p.noise_lacunarity ** (p.noise_octaves - 1) # finest octave
+    for resolution in resolutions:
+        q = settings.Namespace(p, terrain_reolution = resolution)
+        elapsed, peak = _measure(lambda: noise.Perlin(grid, resolution, q.map_seed, dtype = q.map_dtype), _NOISE_REPEATS)
+        record('perlin %d' % resolution, elapsed, peak)
+        elapsed, peak = _measure(lambda: erosion._generate(q), _NOISE_REPEATS) # never a terrain_cache_dir hit
+        record('octave %d' % resolution, elapsed, peak)
+
+        simulator = erosion.Simulator(q)
+        simulator.run(10) # compiling, for the numba backend
+        for drops in drop_counts:
+            simulator.reset()
+            elapsed, peak = _measure(lambda: simulator.run(drops))
+            record('erosion %d %d' % (resolution, drops), elapsed, peak, drops, simulator.steps)
+
+    report = {
+        'machine': {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'processor': platform.processor(), 'cpus': os.cpu_count()},
+        'parameters': vars(settings.Namespace(p)),
+        'results': results,
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent = 2)
+    return report
+
+
+def Compare(baseline, current, threshold = .1):
+    """
+    Prints each result of current against baseline (reports or JSON paths) and returns the names that got
+    more than threshold slower (best wall time) or bigger (peak memory, past _MEMORY_SLACK).
+    """
+    reports = []
+    for report in (baseline, current):
+        if isinstance(report, str):
+            with open(report) as f:
+                report = json.load(f)
+        reports.append(report['results'])
+    baseline, current = reports
+
+    regressions = []
+    for name in baseline:
+        if name not in current:
+            continue
+        flags = []
+        for key in ('wall', 'peak_memory'):
+            old, new = baseline[name][key], current[name][key]
+            if new > old * (1 + threshold) and (key == 'wall' or new - old > _MEMORY_SLACK):
+                flags.append(key)
+        ratio = current[name]['wall'] / baseline[name]['wall']
+        print('%-22s %9.3f s -> %9.3f s %6.2fx %s' % (name, baseline[name]['wall'], current[name]['wall'], ratio,
+            ' '.join('REGRESSION(%s)' % f for f in flags)))
+        if flags:
+            regressions.append(name)
+    return regressions
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Quality ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+# Channel depth is the mean erosion of this fraction of the most eroded cells
+_CHANNEL_FRACTION = .01
+
+
+def _quality(base, ermap):
+    # Channel depth, roughness (mean |laplacian| of the height change, jitter & deposit bumps) & pits
+    # (interior cells below all 8 neighbours) of an eroded map
+    change = ermap - base
+    deepest = np.sort(-change, axis = None)[-max(int(change.size * _CHANNEL_FRACTION), 1):]
+    ring = np.ones((3, 3), bool)
+    ring[1, 1] = False
+    pits = ermap < ndimage.minimum_filter(ermap, footprint = ring)
+    return {
+        'channel_depth': float(deepest.mean()),
+        'roughness': float(np.abs(ndimage.laplace(change)).mean()),
+        'pits': int(np.count_nonzero(pits[1:-1, 1:-1])),
+    }
+
+
+def Quality(resolution = 256, drop_counts = (2500, 5000, 10000, 20000, 40000), output = None, p = param, variants = None):
+    """
+    Erodes one map with each variant (name: parameter overrides, nearest & bilinear drop_sampling by default),
+    measuring the terrain at every drop count, and prints how many drops every other variant needs for the channel
+    depth the first reaches with the most drops. Returns the results (& writes them to output as JSON).
+    """
+    variants = variants or {'nearest': {'drop_sampling': 'nearest'}, 'bilinear': {'drop_sampling': 'bilinear'}}
+    counts = sorted(drop_counts)
+    results = {}
+    for name, overrides in variants.items():
+        q = settings.Namespace(p, terrain_reolution = resolution, **overrides)
+        simulator = erosion.Simulator(q)
+        base = simulator.heightmap.copy()
+        results[name] = {}
+        for drops in counts:
+            start = time.perf_counter()
+            simulator.run(drops - simulator.next_drop)
+            entry = _quality(base, simulator.heightmap)
+            entry['wall'] = time.perf_counter() - start
+            results[name][drops] = entry
+            print('%-10s %7d drops  channel depth %8.3f  roughness %8.4f  pits %6d' % (name, drops,
+                entry['channel_depth'], entry['roughness'], entry['pits']))
+
+    # Drops every variant needs for the baseline's deepest channels, interpolated between drop counts
+    baseline, *others = variants
+    target = results[baseline][counts[-1]]['channel_depth']
+    results['equivalent'] = {baseline: counts[-1]}
+    for name in others:
+        depths = [results[name][drops]['channel_depth'] for drops in counts]
+        needed = None
+        for i, depth in enumerate(depths):
+            if depth >= target:
+                needed = counts[0] if i == 0 else counts[i - 1] + (counts[i] - counts[i - 1]) * (
+                    (target - depths[i - 1]) / (depth - depths[i - 1]))
+                break
+        results['equivalent'][name] = needed
+        if needed is None:
+            print('%s never reaches the channel depth of %d %s drops' % (name, counts[-1], baseline))
+        else:
+            print('%s reaches the channel depth of %d %s drops with ~%d drops (%.0f%% fewer)' % (name, counts[-1],
+                baseline, needed, 100 * (1 - needed / counts[-1])))
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'parameters': vars(settings.Namespace(p)), 'results': results}, f, indent = 2)
+    return results
+
+
+def Spawn(resolution = 256, drop_counts = (2500, 5000, 10000, 20000, 40000), output = None, p = param,
+        distributions = ('uniform', 'slope', 'flow', 'stratified')):
+    """
+    Quality() of each rain_distribution against uniform rain.
+    """
+    variants = {name: {'rain_distribution': name} for name in distributions}
+    return Quality(resolution, drop_counts, output, p, variants)
+
+
+def Multires(resolution = 1024, levels = (1, 2, 3), drops = None, output = None, p = param):
+    """
+    Erodes one map in one level & coarse to fine over each number of levels (multires.py) with drops at full resolution
+    (drop_iterations per 256x256 by default), printing the wall time, _quality and how closely the large scale change
+    (blurred over 8 cells) follows the single level run's. Returns the results (& writes them to output as JSON).
+    """
+    drops = drops or int(p.drop_iterations * (resolution / 256) ** 2)
+    q = settings.Namespace(p, terrain_reolution = resolution, drop_iterations = drops)
+    base = erosion.Terrain(q)
+    if kernels.available and q.drop_backend == 'numba':
+        engine.Backend('numba')(np.array(base), np.zeros((1, 2)), q) # compiling
+
+    results, reference = {}, None
+    for count in levels:
+        ermap = np.array(base)
+        start = time.perf_counter()
+        steps = multires.Erode(ermap, settings.Namespace(q, multires_levels = count))
+        entry = _quality(base, ermap)
+        entry.update({'wall': time.perf_counter() - start, 'steps': int(steps)})
+        change = ndimage.gaussian_filter(ermap.astype(float) - base, 8)
+        if reference is None:
+            reference = change
+        entry['large_scale_correlation'] = float(np.corrcoef(change.reshape(-1), reference.reshape(-1))[0, 1])
+        results[count] = entry
+        print('%d levels %8.2f s (%5.1f%%)  channel depth %8.3f  roughness %8.4f  pits %7d  correlation %.3f' % (count,
+            entry['wall'], 100 * entry['wall'] / results[levels[0]]['wall'], entry['channel_depth'], entry['roughness'],
+            entry['pits'], entry['large_scale_correlation']))
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'parameters': vars(q), 'results': results}, f, indent = 2)
+    return results
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Erosion & noise benchmarks')
+    commands = parser.add_subparsers(dest = 'command')
+    commands.add_parser('engines', help = 'drops/sec of every engine')
+    scaling = commands.add_parser('tiled', help = 'drops/sec of tiled erosion for each process count')
+    scaling.add_argument('--resolution', type = int, default = 1024)
+    scaling.add_argument('--drops', type = int, default = 20000)
+    scaling.add_argument('--processes', type = int, nargs = '+', default = [1, 2, 4, 8])
+    precision = commands.add_parser('precision', help = 'runtime & error of float32 against float64 maps')
+    precision.add_argument('--resolution', type = int, default = 512)
+    precision.add_argument('--drops', type = int, default = 5000)
+    fields = commands.add_parser('gradient', help = 'incremental gradient updates against a full np.gradient per drop')
+    fields.add_argument('--resolution', type = int, default = 256)
+    fields.add_argument('--drops', type = int, default = 1000)
+    suite = commands.add_parser('suite', help = 'fixed-seed suite written to a JSON results file')
+    suite.add_argument('output')
+    suite.add_argument('--resolutions', type = int, nargs = '+', default = [128, 256, 1024, 4096])
+    suite.add_argument('--drops', type = int, nargs = '+', default = [1000, 5000])
+    compare = commands.add_parser('compare', help = 'flag regressions against a baseline results file')
+    compare.add_argument('baseline')
+    compare.add_argument('results')
+    compare.add_argument('--threshold', type = float, default = .1, help = 'allowed slowdown, .1 is 10%%')
+    quality = commands.add_parser('quality', help = 'terrain quality against drop count, nearest vs bilinear sampling')
+    quality.add_argument('--resolution', type = int, default = 256)
+    quality.add_argument('--drops', type = int, nargs = '+', default = [2500, 5000, 10000, 20000, 40000])
+    quality.add_argument('--output')
+    spawning = commands.add_parser('spawn', help = 'terrain quality against drop count for each rain_distribution')
+    spawning.add_argument('--resolution', type = int, default = 256)
+    spawning.add_argument('--drops', type = int, nargs = '+', default = [2500, 5000, 10000, 20000, 40000])
+    spawning.add_argument('--distributions', nargs = '+', default = ['uniform', 'slope', 'flow', 'stratified'])
+    spawning.add_argument('--output')
+    pyramid = commands.add_parser('multires', help = 'wall time & terrain quality of coarse-to-fine erosion')
+    pyramid.add_argument('--resolution', type = int, default = 1024)
+    pyramid.add_argument('--levels', type = int, nargs = '+', default = [1, 2, 3])
+    pyramid.add_argument('--drops', type = int)
+    pyramid.add_argument('--output')
+    args = parser.parse_args()
+
+    if args.command == 'tiled':
+        Tiled(args.resolution, args.drops, args.processes)
+    elif args.command == 'precision':
+        Precision(args.resolution, args.drops)
+    elif args.command == 'gradient':
+        Gradient(args.resolution, args.drops)
+    elif args.command == 'suite':
+        Suite(args.resolutions, args.drops, args.output)
+    elif args.command == 'compare':
+        sys.exit(1 if Compare(args.baseline, args.results, args.threshold) else 0)
+    elif args.command == 'quality':
+        Quality(args.resolution, args.drops, args.output)
+    elif args.command == 'spawn':
+        Spawn(args.resolution, args.drops, args.output, distributions = args.distributions)
+    elif args.command == 'multires':
+        Multires(args.resolution, args.levels, args.drops, args.output)
+    else:
+        Engines()
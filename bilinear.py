@@ -0,0 +1,115 @@
+#
+# 10/18/26
+# ---------------------------------------- Bilinear Sampling ----------------------------------------
+"""
+Sub-cell sampling for drop_sampling = 'bilinear': the four corner weights of a drop's position, shared
+by the gradient & height lookups and the deposit split.
+"""
+# A drop at (y, x) sits in the square of cells (r, c), (r, c + 1), (r + 1, c), (r + 1, c + 1) with
+# r, c = floor(y), floor(x). With fy = y - r & fx = x - c the weights are
+#   w00 = (1 - fy)(1 - fx)   w01 = (1 - fy) fx   w10 = fy (1 - fx)   w11 = fy fx
+# and always sum to 1. The engines compute them once per step at the drop's new position, use them for
+# the height there, and keep them as the next step's weights for the gradient, height & deposit.
+#
+# A drop is only inside the map while its whole square is, so the last row & column can't hold a
+# top-left corner (see Bounds).
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import math
+import numpy as np
+
+SAMPLING = ('nearest', 'bilinear')
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Weights ----------------------------------------
+
+def Enabled(p):
+    """
+    True for drop_sampling = 'bilinear', False for 'nearest'.
+    """
+    if p.drop_sampling not in SAMPLING:
+        raise ValueError('unknown drop_sampling %r, expected one of %s' % (p.drop_sampling, ', '.join(SAMPLING)))
+    return p.drop_sampling == 'bilinear'
+
+
+def Bounds(bounds, shape):
+    """
+    The (r0, r1, c0, c1) box top-left corners have to stay in, for drops that may not leave bounds or the map.
+    """
+    r0, r1, c0, c1 = bounds or (0, shape[0], 0, shape[1])
+    return r0, min(r1, shape[0] - 1), c0, min(c1, shape[1] - 1)
+
+
+def Corners(pos_y, pos_x, one):
+    """
+    Top-left cell (r, c) of a position & its weights (w00, w01, w10, w11), in the dtype of one.
+    """
+    r, c = math.floor(pos_y), math.floor(pos_x)
+    fy, fx = pos_y - r, pos_x - c
+    gy, gx = one - fy, one - fx
+    return r, c, (gy * gx, gy * fx, fy * gx, fy * fx)
+
+
+def Sample(field, r, c, weights):
+    """
+    field interpolated at the position weights came from.
+    """
+    w00, w01, w10, w11 = weights
+    return field[r, c] * w00 + field[r, c + 1] * w01 + field[r + 1, c] * w10 + field[r + 1, c + 1] * w11
+
+
+def CornersMany(pos_y, pos_x, r, c, weights, work, one):
+    """
+    Corners() for arrays of positions, written into the int arrays r & c and the four weights arrays.
+    work is two scratch arrays, the same operations as Corners() give the same weights.
+    """
+    fy, fx = work
+    w00, w01, w10, w11 = weights
+    np.floor(pos_y, out = fy)
+    np.copyto(r, fy, casting = 'unsafe')
+    np.subtract(pos_y, fy, out = fy)
+    np.floor(pos_x, out = fx)
+    np.copyto(c, fx, casting = 'unsafe')
+    np.subtract(pos_x, fx, out = fx)
+    gy = np.subtract(one, fy, out = w01)
+    gx = np.subtract(one, fx, out = w10)
+    np.multiply(gy, gx, out = w00)
+    np.multiply(gy, fx, out = w01)
+    np.multiply(fy, gx, out = w10)
+    np.multiply(fy, fx, out = w11)
+
+
+def SampleMany(field, cells, cols, weights, out, value, corner):
+    """
+    Sample() for arrays of flat top-left cells of a flattened field with cols columns, written into out.
+    value & corner are scratch arrays of the field dtype & intp.
+    """
+    w00, w01, w10, w11 = weights
+    np.multiply(np.take(field, cells, out = value), w00, out = out)
+    np.add(out, np.multiply(np.take(field, np.add(cells, 1, out = corner), out = value), w01, out = value), out = out)
+    np.add(out, np.multiply(np.take(field, np.add(cells, cols, out = corner), out = value), w10, out = value),
+        out = out)
+    np.add(out, np.multiply(np.take(field, np.add(cells, cols + 1, out = corner), out = value), w11, out = value),
+        out = out)
+
+
+def ScatterMany(field, cells, cols, weights, amounts, work, corner):
+    """
+    Adds amounts split by weights to the four corners of arrays of flat top-left cells of a flattened field.
+    work & corner are scratch arrays of the field dtype & intp.
+    """
+    w00, w01, w10, w11 = weights
+    np.add.at(field, cells, np.multiply(amounts, w00, out = work))
+    np.add.at(field, np.add(cells, 1, out = corner), np.multiply(amounts, w01, out = work))
+    np.add.at(field, np.add(cells, cols, out = corner), np.multiply(amounts, w10, out = work))
+    np.add.at(field, np.add(cells, cols + 1, out = corner), np.multiply(amounts, w11, out = work))
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
@@ -0,0 +1,216 @@
+#
+# 10/18/26
+# ---------------------------------------- Erosion Brush ----------------------------------------
+"""
+Precomputed erosion kernels for spreading eroded sediment over a radius of cells.
+"""
+# Each radius gets a cone of weights (radius + 1 - distance) over the disc, normalised to sum to 1,
+# and a summed-area table so the weight left after clipping at the map edge is an O(1) lookup.
+# Kernels are built once per radius and cached.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import numpy as np
+from functools import lru_cache
+
+# The arrays of Scratch(), Cut() adds views of them
+_SCRATCH = ('kr0', 'kr1', 'kc0', 'kc1', 'flat', 'total', 'value', 'r', 'c', 'amount', 'inside', 'outside')
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Kernels ----------------------------------------
+
+class Brush:
+    """
+    Weight tables for one radius. weights is (2R + 1)^2 centred on the eroded cell, dy/dx/w list its non-zero entries.
+    """
+
+    def __init__(self, radius, dtype = float):
+        self.radius = radius
+        d = np.arange(-radius, radius + 1)
+        dist = np.sqrt(d[:, None] ** 2 + d[None, :] ** 2)
+        cone = np.where(dist <= radius, radius + 1 - dist, 0)
+        self.weights = (cone / cone.sum()).astype(dtype)
+
+        # Summed-area table, table[i, j] = weights[:i, :j].sum()
+        self.table = np.zeros((2 * radius + 2, 2 * radius + 2), dtype)
+        self.table[1:, 1:] = self.weights.cumsum(0).cumsum(1)
+
+        # Flat offsets for scattering many drops at once
+        self.dy, self.dx = [a - radius for a in np.nonzero(self.weights)]
+        self.w = self.weights[self.dy + radius, self.dx + radius]
+
+        for a in (self.weights, self.table, self.dy, self.dx, self.w):
+            a.setflags(write = False)
+
+    def window(self, index, shape):
+        """
+        Clipped map slices, matching kernel slices & the weight left inside the map for a brush centred on index.
+        """
+        R = self.radius
+        r, c = index
+        r0, r1 = max(r - R, 0), min(r + R + 1, shape[0])
+        c0, c1 = max(c - R, 0), min(c + R + 1, shape[1])
+        kr0, kr1 = r0 - r + R, r1 - r + R
+        kc0, kc1 = c0 - c + R, c1 - c + R
+        t = self.table
+        total = t[kr1, kc1] - t[kr0, kc1] - t[kr1, kc0] + t[kr0, kc0]
+        return (slice(r0, r1), slice(c0, c1)), (slice(kr0, kr1), slice(kc0, kc1)), total
+
+    def totals(self, rows, cols, shape, scratch = None):
+        """
+        Vectorised weight left inside the map for brushes centred on arrays of cells.
+        With scratch (see Scratch) nothing is allocated and the result is a view of scratch['total'].
+        """
+        R = self.radius
+        if scratch is not None:
+            return self._totals_into(rows, cols, shape, scratch)
+        kr0 = np.maximum(rows - R, 0) - rows + R
+        kr1 = np.minimum(rows + R + 1, shape[0]) - rows + R
+        kc0 = np.maximum(cols - R, 0) - cols + R
+        kc1 = np.minimum(cols + R + 1, shape[1]) - cols + R
+        t = self.table
+        return t[kr1, kc1] - t[kr0, kc1] - t[kr1, kc0] + t[kr0, kc0]
+
+    def _totals_into(self, rows, cols, shape, scratch):
+        # totals() written into scratch arrays, same operations in the same order
+        R = self.radius
+        if len(scratch['total']) != len(rows):
+            scratch = Cut(scratch, len(rows))
+        kr0, kr1, kc0, kc1, flat = scratch['kr0'], scratch['kr1'], scratch['kc0'], scratch['kc1'], scratch['flat']
+        total, value = scratch['total'], scratch['value']
+        np.maximum(np.subtract(rows, R, out = kr0), 0, out = kr0)
+        np.minimum(np.add(rows, R + 1, out = kr1), shape[0], out = kr1)
+        np.maximum(np.subtract(cols, R, out = kc0), 0, out = kc0)
+        np.minimum(np.add(cols, R + 1, out = kc1), shape[1], out = kc1)
+        np.add(np.subtract(kr0, rows, out = kr0), R, out = kr0)
+        np.add(np.subtract(kr1, rows, out = kr1), R, out = kr1)
+        np.add(np.subtract(kc0, cols, out = kc0), R, out = kc0)
+        np.add(np.subtract(kc1, cols, out = kc1), R, out = kc1)
+
+        t = self.table
+        _lookup(t, kr1, kc1, flat, total)
+        np.subtract(total, _lookup(t, kr0, kc1, flat, value), out = total)
+        np.subtract(total, _lookup(t, kr1, kc0, flat, value), out = total)
+        np.add(total, _lookup(t, kr0, kc0, flat, value), out = total)
+        return total
+
+
+def _lookup(table, a, b, flat, out):
+    # table[a, b] through the flat index scratch array
+    np.add(np.multiply(a, table.shape[1], out = flat), b, out = flat)
+    return np.take(table, flat, out = out)
+
+
+def Scratch(radius, capacity, dtype = float):
+    """
+    Preallocated arrays for ErodeMany & Brush.totals on up to capacity drops, so a call allocates nothing.
+    """
+    size = len(Kernel(radius, dtype).w)
+    scratch = {k: np.zeros(capacity, np.intp) for k in ('kr0', 'kr1', 'kc0', 'kc1', 'flat')}
+    scratch.update({k: np.zeros(capacity, dtype) for k in ('total', 'value')})
+    scratch.update({k: np.zeros((capacity, size), np.intp) for k in ('r', 'c')})
+    scratch['amount'] = np.zeros((capacity, size), dtype)
+    scratch.update({k: np.zeros((capacity, size), bool) for k in ('inside', 'outside')})
+    return scratch
+
+
+def Cut(scratch, n):
+    """
+    Views of Scratch() arrays for n drops, plus the column & flat views ErodeMany works through. Made once per drop
+    count (droplet.DropletPool.live), ErodeMany then makes no views either.
+    """
+    cut = {k: a[:n] for k, a in scratch.items() if k in _SCRATCH}
+    cut['total_column'] = cut['total'][:, None]
+    cut['r_flat'], cut['amount_flat'] = cut['r'].reshape(-1), cut['amount'].reshape(-1)
+    return cut
+
+
+def Kernel(radius, dtype = float):
+    """
+    The cached Brush for an integer radius, with weights in dtype.
+    """
+    return _kernel(int(radius), np.dtype(dtype))
+
+
+@lru_cache(maxsize = None)
+def _kernel(radius, dtype):
+    return Brush(radius, dtype)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Applying ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Erode(heightmap, index, amount, radius):
+    """
+    Removes amount of material around index, clipped at the map edges so the total removed is still amount.
+    """
+    brush = Kernel(radius, heightmap.dtype)
+    cells, kernel, total = brush.window(index, heightmap.shape)
+    heightmap[cells] -= amount * brush.weights[kernel] / total
+
+
+def ErodeMany(heightmap, rows, cols, amounts, radius, scratch = None):
+    """
+    Erode() for arrays of drops at once. Overlapping brushes are accumulated with np.subtract.at.
+    scratch from Scratch() (or Cut() of it for len(rows) drops) makes it allocation free, cells past the edge then get
+    0 subtracted from a clipped cell.
+    """
+    brush = Kernel(radius, heightmap.dtype)
+    shape = heightmap.shape
+    if scratch is not None:
+        return _erode_many_into(heightmap, rows, cols, amounts, brush, scratch)
+    total = brush.totals(rows, cols, shape)
+    r = rows[:, None] + brush.dy
+    c = cols[:, None] + brush.dx
+    inside = (r >= 0) & (r < shape[0]) & (c >= 0) & (c < shape[1])
+    amount = amounts[:, None] * brush.w / total[:, None]
+    np.subtract.at(heightmap, (r[inside], c[inside]), amount[inside])
+
+
+def _erode_many_into(heightmap, rows, cols, amounts, brush, scratch):
+    # ErodeMany() in scratch arrays
+    rows_map, cols_map = heightmap.shape
+    if len(scratch.get('total_column', ())) != len(rows):
+        scratch = Cut(scratch, len(rows))
+    total = brush.totals(rows, cols, heightmap.shape, scratch)
+    r, c, amount = scratch['r'], scratch['c'], scratch['amount']
+    inside, outside = scratch['inside'], scratch['outside']
+    np.add.outer(rows, brush.dy, out = r)
+    np.add.outer(cols, brush.dx, out = c)
+
+    # Cells past the edge are clipped onto the map with nothing to subtract
+    np.greater_equal(r, 0, out = inside)
+    np.logical_and(inside, np.less(r, rows_map, out = outside), out = inside)
+    np.logical_and(inside, np.greater_equal(c, 0, out = outside), out = inside)
+    np.logical_and(inside, np.less(c, cols_map, out = outside), out = inside)
+    np.logical_not(inside, out = outside)
+    np.minimum(np.maximum(r, 0, out = r), rows_map - 1, out = r)
+    np.minimum(np.maximum(c, 0, out = c), cols_map - 1, out = c)
+
+    np.multiply.outer(amounts, brush.w, out = amount)
+    np.divide(amount, scratch['total_column'], out = amount)
+    np.copyto(amount, 0, where = outside)
+
+    # ufunc.at is much faster on one flat index array than on a tuple of 2D ones, the flat view of the map is kept
+    # with the cut scratch so it's made once per map
+    if scratch.get('map') is not heightmap:
+        scratch['map'] = heightmap
+        scratch['map_flat'] = heightmap.reshape(-1) if heightmap.flags.c_contiguous else None
+    if scratch['map_flat'] is not None:
+        np.add(np.multiply(r, cols_map, out = r), c, out = r)
+        np.subtract.at(scratch['map_flat'], scratch['r_flat'], scratch['amount_flat'])
+    else:
+        np.subtract.at(heightmap, (r, c), amount)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
@@ -0,0 +1,157 @@
+#
+# 10/18/26
+# ---------------------------------------- Terrain Cache ----------------------------------------
+"""
+On-disk cache of generated base terrains, keyed by the noise parameters & the noise code, loaded with mmap.
+"""
+# Entries are <key>.npy files in the cache directory, where key hashes the noise parameters, the
+# map dtype and the source of noise.py & streams.py, so editing the generator invalidates old entries.
+#
+# Concurrency:
+#   Entries are written to a temporary file and renamed into place, so readers only ever see whole
+#   files. A per-key lock file (fcntl) stops two processes generating the same terrain, the second
+#   one waits and then reads the first one's entry. Eviction runs under a directory lock. An evicted
+#   entry that is still mapped by a reader stays valid until that reader drops it.
+#
+# Eviction:
+#   Least recently used first, by mtime (hits touch the entry), until the entries fit in the budget.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import os
+import json
+import fcntl
+import hashlib
+import contextlib
+import numpy as np
+import noise
+import streams
+import parameters as param
+
+# Bumped when the entry layout changes
+_VERSION = 1
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Keys ----------------------------------------
+
+def _code_version():
+    code = hashlib.sha256()
+    for module in (noise, streams):
+        with open(module.__file__, 'rb') as f:
+            code.update(f.read())
+    return code.hexdigest()
+
+
+def Key(p = param):
+    """
+    Hash of everything the base terrain depends on.
+    """
+    fields = {
+        'version': _VERSION,
+        'code': _code_version(),
+        'resolution': p.terrain_reolution,
+        'octaves': p.noise_octaves,
+        'lacunarity': p.noise_lacunarity,
+        'persistance': p.noise_persistance,
+        'seed': p.map_seed,
+        'dtype': np.dtype(p.map_dtype).name,
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys = True).encode()).hexdigest()
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Cache ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+@contextlib.contextmanager
+def _locked(path):
+    # Exclusive fcntl lock on path, held across processes until the block exits
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _load(path):
+    # Read-only memmap of an entry, None on a miss
+    try:
+        terrain = np.load(path, mmap_mode = 'r')
+    except FileNotFoundError:
+        return None
+    with contextlib.suppress(FileNotFoundError):
+        os.utime(path)
+    return terrain
+
+
+def Terrain(p, generate, directory = None, budget = None):
+    """
+    The terrain generate(p) would make, as a read-only memmap from the cache in directory (p.terrain_cache_dir).
+    Misses generate & store it, then evict old entries past budget bytes (p.terrain_cache_budget).
+    """
+    directory = directory or p.terrain_cache_dir
+    budget = p.terrain_cache_budget if budget is None else budget
+    os.makedirs(directory, exist_ok = True)
+    key = Key(p)
+    path = os.path.join(directory, key + '.npy')
+
+    terrain = _load(path)
+    if terrain is not None:
+        return terrain
+
+    with _locked(os.path.join(directory, key + '.lock')):
+        terrain = _load(path)
+        if terrain is not None:
+            return terrain
+        temporary = '%s.%d.tmp' % (path, os.getpid())
+        with open(temporary, 'wb') as f:
+            np.save(f, np.ascontiguousarray(generate(p)))
+
+        # Mapped before anyone can evict it
+        with _locked(os.path.join(directory, '.lock')):
+            os.replace(temporary, path)
+            terrain = _load(path)
+            _evict(directory, budget, keep = path)
+    return terrain
+
+
+def Evict(directory, budget, keep = None):
+    """
+    Deletes the least recently used entries until the rest fit in budget bytes. keep is never deleted.
+    """
+    with _locked(os.path.join(directory, '.lock')):
+        _evict(directory, budget, keep)
+
+
+def _evict(directory, budget, keep = None):
+    # Evict() with the directory lock already held
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith('.npy'):
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, os.path.join(directory, name)))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        if path == keep:
+            continue
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        total -= size
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
@@ -0,0 +1,184 @@
+#
+# 10/18/26
+# ---------------------------------------- Checkpoints ----------------------------------------
+"""
+Periodic checkpoints of long erosion runs and resuming from them. Resume with: python checkpoint.py <path>
+"""
+# Resuming from the command line finishes the run like erosion.py does (blur, export & render with
+# the checkpoint's parameters).
+# A checkpoint is an uncompressed .npz holding the heightmap, the index of the next drop, the
+# parameters as JSON and the rain weights of weighted rain_distributions (spawn.py), which came from
+# the map before any erosion. Drops are drawn from the rain_seed streams by index (streams.py), so
+# no RNG state is needed to draw the rest of them. It is written to a
+# temporary file and renamed over the old one, so a crash mid-write leaves the previous checkpoint.
+#
+# Drops are run in chunks of checkpoint_every_drops (or _CHUNK_DROPS when that is 0) and
+# checkpoints are only taken on chunk boundaries. Resuming therefore replays exactly the same
+# chunks as an uninterrupted run and gives a bit-for-bit identical heightmap. The reference, numba
+# & batched engines give the same map for any chunking, tiled erosion splits its rounds per chunk
+# so it only matches runs with the same checkpoint_every_drops.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import os
+import sys
+import json
+import time
+import threading
+import numpy as np
+import engine
+import spawn
+import settings
+import parameters as param
+
+# Chunk size when checkpoints are only time based
+_CHUNK_DROPS = 1000
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Saving & Loading ----------------------------------------
+
+def Save(path, heightmap, next_drop, p, weights = None):
+    """
+    Atomically writes a checkpoint to path, weights are the spawn weights of a weighted rain_distribution.
+    """
+    header = {
+        'next_drop': int(next_drop),
+        'parameters': vars(settings.Namespace(p)),
+    }
+    arrays = {} if weights is None else {'spawn_weights': weights}
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        np.savez(f, heightmap = heightmap, header = np.array(json.dumps(header)), **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def Load(path):
+    """
+    Reads a checkpoint, returning (heightmap, next_drop, parameters, spawn weights or None).
+    """
+    with np.load(path) as data:
+        header = json.loads(str(data['header']))
+        heightmap = data['heightmap']
+        weights = data['spawn_weights'] if 'spawn_weights' in data else None
+    return heightmap, header['next_drop'], settings.Namespace(**header['parameters']), weights
+
+
+class Writer:
+    """
+    Writes checkpoints on a background thread from a copy of the heightmap, so the simulation only pays for the copy.
+    If a write is still running the newest snapshot replaces any waiting one. A failed write is raised again by the next
+    write() or close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pending = None
+        self.error = None
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(target = self._run, daemon = True)
+        self.thread.start()
+
+    def write(self, heightmap, next_drop, p, weights = None):
+        """
+        Queues a snapshot, raising a previous write that failed so a run doesn't go on without checkpoints.
+        """
+        if self.error is not None:
+            raise self.error
+        with self.condition:
+            self.pending = (heightmap.copy(), next_drop, p, weights)
+            self.condition.notify()
+
+    def close(self):
+        """
+        Finishes any waiting write and stops the thread, raising the first write that failed.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                job, self.pending = self.pending, None
+            try:
+                Save(self.path, *job)
+            except Exception as error:
+                self.error = self.error or error
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Running ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Run(heightmap, p = param, path = None, start = 0, verbose = False, stats = None, weights = None):
+    """
+    Rains p.drop_iterations drops on heightmap (in place) from drop start onward, checkpointing to path
+    every p.checkpoint_every_drops drops and/or p.checkpoint_every_seconds seconds.
+    weights are the spawn weights to use instead of computing them from heightmap.
+    stats is an optional instrument.Recorder.
+    """
+    path = path or p.checkpoint_path
+    if p.multires_levels > 1:
+        raise ValueError('checkpointed runs erode at full resolution only, set multires_levels = 1 or checkpoint_path = \'\'')
+
+    # Generating the remaining drops, the same drops as erosion.py
+    spawner = spawn.Spawner(p, heightmap, weights)
+    drops = spawner.draw(p.drop_iterations - start, start)
+
+    # Every chunk ends on a drop checkpoint, rounded up to whole lockstep batches so they don't change the result
+    chunk = p.checkpoint_every_drops or _CHUNK_DROPS
+    if p.drop_batch_size > 1:
+        chunk = -(-chunk // p.drop_batch_size) * p.drop_batch_size
+    erode = engine.Erosion(p)
+    field = engine.Field(p, heightmap)
+
+    writer = Writer(path) if path else None
+    last_write = time.monotonic()
+    try:
+        for i in range(start, p.drop_iterations, chunk):
+            end = min(i + chunk, p.drop_iterations)
+            erode(heightmap, drops[i - start:end - start], p, verbose = verbose, stats = stats, field = field)
+            due_time = p.checkpoint_every_seconds and time.monotonic() - last_write >= p.checkpoint_every_seconds
+            if writer and (p.checkpoint_every_drops or due_time or end == p.drop_iterations):
+                writer.write(heightmap, end, p, spawner.weights)
+                last_write = time.monotonic()
+    finally:
+        if writer:
+            writer.close()
+    return heightmap
+
+
+def Resume(path, verbose = False):
+    """
+    Continues the run saved at path to the end, returning the heightmap & parameters.
+    """
+    heightmap, next_drop, p, weights = Load(path)
+    return Run(heightmap, p, path, next_drop, verbose, weights = weights), p
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+if __name__ == '__main__':
+    import erosion # erosion imports this module
+    ermap, p = Resume(sys.argv[1], verbose = True)
+    erosion.Finish(ermap, p)
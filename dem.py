@@ -0,0 +1,252 @@
+#
+# 10/18/26
+# ---------------------------------------- Heightmap Import ----------------------------------------
+"""
+Lazy reading of large external heightmaps (8/16-bit greyscale PNG, raw & .npy) and window by window erosion of them.
+"""
+# Open() reads nothing but the header: .npy & raw files are memory-mapped and a PNG only has its
+# chunks listed, so opening a 16k x 16k map is instant. read(r0, r1, c0, c1) then returns just that
+# window, converted to the simulation dtype on the way.
+#
+# PNG rows can only be decoded in order, every filter depends on the row above, so the PNG reader
+# inflates the IDAT stream as far as the window needs (zlib.decompressobj) and unfilters the rows
+# with kernels.Unfilter, which needs numba to be fast (Open warns without it). It keeps the decoded
+# rows from the start of the last window read, so windows read top to bottom are decoded once.
+# Reading above them restarts from the first row.
+# Heights of a PNG are low + value / maxval * (high - low) when low & high are given or found in
+# the export.py sidecar (base.json next to the image), otherwise the values themselves.
+#
+# Erode() streams the map into a .npy output and erodes it in dem_window x dem_window cores with a
+# halo, like tiled.py but one window at a time in row-major order, so only one window is in memory.
+# A window rains the drop density of a generated map on its core from a rain stream of its own
+# (the tile row & column are the stream key), and drops leaving the core end as at the map edge.
+# The whole window is written back, so what the brush & deposits put in the halo is kept and the
+# seams between windows conserve mass like the rest of the map.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import os
+import sys
+import json
+import zlib
+import struct
+import warnings
+import numpy as np
+import engine
+import spawn
+import tiled
+import settings
+import parameters as param
+
+FORMATS = ('npy', 'png', 'raw')
+
+# Inflated bytes asked of zlib at a time, bounds the memory of highly compressed rows
+_INFLATE = 1 << 22
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Readers ----------------------------------------
+
+class Array:
+    """
+    A memory-mapped .npy or raw heightmap, read window by window in dtype.
+    """
+
+    def __init__(self, data, dtype):
+        self.data = data
+        self.shape = data.shape
+        self.dtype = np.dtype(dtype)
+
+    def read(self, r0 = 0, r1 = None, c0 = 0, c1 = None):
+        """
+        Rows r0 to r1 & columns c0 to c1 (the whole map by default) as a new array.
+        """
+        return np.array(self.data[r0:r1, c0:c1], dtype = self.dtype)
+
+
+class Png:
+    """
+    A greyscale 8 or 16-bit PNG, decoded row by row as windows are read, see the notes at the top.
+    """
+
+    def __init__(self, path, dtype, low = None, high = None):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.idat = []
+        with open(path, 'rb') as f:
+            if f.read(8) != b'\x89PNG\r\n\x1a\n':
+                raise ValueError('%r is not a PNG' % path)
+            if f.read(8)[4:] != b'IHDR':
+                raise ValueError('%r does not start with an IHDR chunk' % path)
+            cols, rows, depth, colour, _, _, interlace = struct.unpack('>IIBBBBB', f.read(13))
+            f.seek(4, 1)
+            while True:
+                head = f.read(8)
+                if len(head) < 8:
+                    raise ValueError('%r ends before its IEND chunk' % path)
+                length, kind = struct.unpack('>I4s', head)
+                if kind == b'IDAT':
+                    self.idat.append((f.tell(), length))
+                elif kind == b'IEND':
+                    break
+                f.seek(length + 4, 1)
+        if colour not in (0, 4) or depth not in (8, 16) or interlace:
+            raise ValueError('%r has colour type %d, bit depth %d & interlace %d, only non-interlaced 8 or 16-bit '
+                'greyscale is supported' % (path, colour, depth, interlace))
+        self.shape = (rows, cols)
+        self.samples = 1 if colour == 0 else 2 # grey, or grey & alpha
+        self.bpp = self.samples * depth // 8
+        self.stride = cols * self.bpp
+        self.sample = np.dtype('u1' if depth == 8 else '>u2')
+        self.scale = None if low is None or high is None else ((high - low) / (2 ** depth - 1), low)
+        import kernels # numba is only needed for PNGs
+        if not kernels.available:
+            warnings.warn('numba is not installed, %r will be unfiltered in pure Python, which takes hours at 16k x 16k'
+                % path)
+        self.unfilter = kernels.Unfilter
+        self._restart()
+
+    def _restart(self):
+        # Back to the first row
+        self.inflate = zlib.decompressobj()
+        self.chunk = 0
+        self.pending = bytearray()
+        self.previous = np.zeros(self.stride, np.uint8)
+        self.rows = np.zeros((0, self.stride), np.uint8)
+        self.first = self.decoded = 0
+
+    def _decode(self, n):
+        # The next n rows, unfiltered
+        need = n * (self.stride + 1)
+        with open(self.path, 'rb') as f:
+            while len(self.pending) < need:
+                if not self.inflate.unconsumed_tail:
+                    if self.chunk == len(self.idat):
+                        raise ValueError('%r has less image data than its %d rows' % (self.path, self.shape[0]))
+                    offset, length = self.idat[self.chunk]
+                    f.seek(offset)
+                    data = f.read(length)
+                    self.chunk += 1
+                else:
+                    data = self.inflate.unconsumed_tail
+                self.pending += self.inflate.decompress(data, max(need - len(self.pending), _INFLATE))
+        filtered = np.frombuffer(bytes(self.pending[:need]), np.uint8).reshape(n, self.stride + 1)
+        del self.pending[:need]
+        rows = self.unfilter(filtered, self.previous, self.bpp)
+        self.previous = rows[-1].copy()
+        self.decoded += n
+        return rows
+
+    def read(self, r0 = 0, r1 = None, c0 = 0, c1 = None):
+        """
+        Rows r0 to r1 & columns c0 to c1 (the whole map by default) as a new array.
+        """
+        r1 = self.shape[0] if r1 is None else min(r1, self.shape[0])
+        if r0 < self.first:
+            self._restart()
+
+        # Dropping cached rows above the window & decoding past it, skipped rows in bounded strips
+        self.rows = self.rows[max(r0 - self.first, 0):]
+        self.first = max(self.first, min(r0, self.decoded))
+        while self.decoded < r0:
+            self._decode(min(r0 - self.decoded, max(_INFLATE // self.stride, 1)))
+            self.first = self.decoded
+        if r1 > self.decoded:
+            self.rows = np.concatenate((self.rows, self._decode(r1 - self.decoded)))
+
+        rows = self.rows[r0 - self.first:r1 - self.first]
+        values = rows.view(self.sample)[:, ::self.samples][:, c0:c1]
+        if self.scale is None:
+            return values.astype(self.dtype)
+        step, low = self.scale
+        return (low + values * step).astype(self.dtype)
+
+
+def Open(path, dtype = None, shape = None, raw_dtype = None, low = None, high = None):
+    """
+    A reader of the heightmap at path (.npy, .png or .raw) with .shape & read(r0, r1, c0, c1), converting to dtype
+    (map_dtype by default). A raw map's shape & dtype (default '<f4') and a PNG's height range are taken from the
+    export.py sidecar when not given.
+    """
+    dtype = dtype or param.map_dtype
+    base, extension = os.path.splitext(path)
+    kind = extension[1:].lower()
+    if kind not in FORMATS:
+        raise ValueError('unknown heightmap format %r, expected one of %s' % (extension, ', '.join(FORMATS)))
+    meta = {}
+    if os.path.exists(base + '.json'):
+        with open(base + '.json') as f:
+            meta = json.load(f).get('files', {}).get(kind, {})
+
+    if kind == 'npy':
+        data = np.load(path, mmap_mode = 'r')
+        if data.ndim != 2:
+            raise ValueError('heightmap %r has shape %s, expected 2 dimensions' % (path, data.shape))
+        return Array(data, dtype)
+    if kind == 'raw':
+        shape = shape or meta.get('shape')
+        if shape is None:
+            raise ValueError('raw heightmap %r needs a shape, none given & no sidecar found' % path)
+        return Array(np.memmap(path, raw_dtype or meta.get('dtype', '<f4'), 'r', shape = tuple(shape)), dtype)
+    return Png(path, dtype, meta.get('low') if low is None else low, meta.get('high') if high is None else high)
+
+
+def Load(path, dtype = None, **options):
+    """
+    The whole heightmap at path in memory, for maps small enough to erode with erosion.Simulator. See Open.
+    """
+    return Open(path, dtype, **options).read()
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Windowed Erosion ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Erode(source, output, p = param, density = None, verbose = False, stats = None):
+    """
+    Erodes an Open()ed heightmap into the .npy at output window by window, returning the total steps.
+    density is drops per cell, by default that of a generated map (drop_iterations over the noise map's area).
+    stats is an optional instrument.Recorder.
+    """
+    p = settings.Namespace(p, tile_processes = 0)
+    if density is None:
+        density = p.drop_iterations / (p.terrain_reolution - 3) ** 2
+    size = p.dem_window
+    halo = max(p.tile_halo, p.erosion_radius + 1)
+    erode = engine.Erosion(p)
+
+    # Converting the map into the output a strip at a time
+    heightmap = np.lib.format.open_memmap(output, 'w+', np.dtype(p.map_dtype), tuple(source.shape))
+    for r0 in range(0, heightmap.shape[0], size):
+        heightmap[r0:r0 + size] = source.read(r0, r0 + size)
+
+    steps = 0
+    per_row = -(-heightmap.shape[1] // size)
+    for t, (core, window, _) in enumerate(tiled.Tiles(heightmap.shape, size, halo)):
+        r0, r1, c0, c1 = window
+        local = np.array(heightmap[r0:r1, c0:c1])
+        bounds = (core[0] - r0, core[1] - r0, core[2] - c0, core[3] - c0)
+        q = settings.Namespace(p, drop_iterations = int(round(density * (core[1] - core[0]) * (core[3] - core[2]))))
+        core_map = local[bounds[0]:bounds[1], bounds[2]:bounds[3]]
+        drops = spawn.Spawner(q, core_map, key = divmod(t, per_row)).draw(q.drop_iterations) + bounds[::2]
+        steps += erode(local, drops, q, bounds, stats = stats)
+        heightmap[r0:r1, c0:c1] = local
+        if verbose:
+            print('window %d, %d drops' % (t, q.drop_iterations))
+    heightmap.flush()
+    return steps
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+if __name__ == '__main__':
+    Erode(Open(sys.argv[1]), sys.argv[2], verbose = True)
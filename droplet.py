@@ -0,0 +1,179 @@
+#
+# 10/18/26
+# ---------------------------------------- Droplets ----------------------------------------
+"""
+The droplet model, finished from the stub in Test Files/drop.py: a __slots__ Droplet for the one-drop
+reference loop & a DropletPool of contiguous arrays for the batched engine.
+"""
+# A pool holds the state of up to `capacity` drops (position, velocity, speed, water & sediment) plus
+# every scratch array a batched step needs, so a step only writes into existing arrays (ufuncs with
+# out=, np.take/np.compress with out=). The views of the live drops, the brush scratch cut to them
+# (brush.Cut) & the tuples of weights the bilinear helpers take are made by live(), when drops start
+# or die, so a step makes no new arrays or views.
+# Pools are borrowed per dtype and returned when an engine call finishes, so back-to-back calls
+# reuse the same arrays.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import types
+import threading
+import contextlib
+import numpy as np
+import brush
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Droplet ----------------------------------------
+
+class Droplet:
+    """
+    One drop's state as scalars of the heightmap dtype.
+    """
+    __slots__ = ('pos_y', 'pos_x', 'vel_y', 'vel_x', 'speed', 'water', 'sediment')
+
+    def __init__(self, pos_y, pos_x, vel_y, vel_x, speed, water, sediment):
+        self.pos_y, self.pos_x = pos_y, pos_x
+        self.vel_y, self.vel_x = vel_y, vel_x
+        self.speed = speed
+        self.water = water
+        self.sediment = sediment
+
+    def __repr__(self):
+        return 'Droplet(pos = (%g, %g), vel = (%g, %g), speed = %g, water = %g, sediment = %g)' % (
+            self.pos_y, self.pos_x, self.vel_y, self.vel_x, self.speed, self.water, self.sediment)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Droplet Pool ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+class DropletPool:
+    """
+    Contiguous arrays for up to capacity drops, one array per quantity. The first n entries are the live drops.
+    """
+    STATE = ('pos_y', 'pos_x', 'vel_y', 'vel_x', 'speed', 'water', 'sediment')
+    SCRATCH = ('pos_ty', 'pos_tx', 'grad', 'norm', 'h0', 'ht', 'del_h', 'fall', 'carry', 'amount', 'work', 'work_2')
+    INDICES = ('row_0', 'col_0', 'row_t', 'col_t', 'flat_0', 'flat_t', 'near_r', 'near_c')
+    MASKS = ('alive', 'depositing', 'eroding', 'mask', 'stop', 'pit')
+
+    # Bilinear corner weights (bilinear.py) at the current & the next position, cell_0/cell_t are their flat top-left cells
+    WEIGHTS = ('w00', 'w01', 'w10', 'w11', 'wt00', 'wt01', 'wt10', 'wt11')
+    CELLS = ('cell_0', 'cell_t', 'corner')
+
+    # Position two steps back, for spotting oscillating drops (termination.py)
+    PREVIOUS = ('prev_y', 'prev_x')
+
+    # Arrays that follow their drop when the pool is compacted, plus BILINEAR with bilinear sampling & PREVIOUS
+    # with drop termination
+    CARRIED = STATE + ('pos_ty', 'pos_tx', 'row_0', 'col_0', 'row_t', 'col_t', 'flat_0')
+    BILINEAR = ('cell_0', 'w00', 'w01', 'w10', 'w11')
+
+    def __init__(self, capacity, dtype = float):
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self.n = 0
+        for name in self.STATE + self.SCRATCH + self.WEIGHTS + self.PREVIOUS:
+            setattr(self, name, np.zeros(capacity, self.dtype))
+        for name in self.INDICES + self.CELLS:
+            setattr(self, name, np.zeros(capacity, np.intp))
+        for name in self.MASKS:
+            setattr(self, name, np.zeros(capacity, bool))
+        self._spare = {self.dtype: np.zeros(capacity, self.dtype), np.dtype(np.intp): np.zeros(capacity, np.intp)}
+        self._brush = {}
+
+    def fill(self, positions, velocity, speed, water):
+        """
+        Starts len(positions) drops at positions (n, 2) with the same velocity, speed & water and no sediment.
+        """
+        n = len(positions)
+        if n > self.capacity:
+            raise ValueError('%d drops do not fit a pool of %d' % (n, self.capacity))
+        self.n = n
+        self.pos_y[:n], self.pos_x[:n] = positions[:, 0], positions[:, 1]
+        self.vel_y[:n], self.vel_x[:n] = velocity
+        self.speed[:n] = speed
+        self.water[:n] = water
+        self.sediment[:n] = 0
+        return self.live()
+
+    def live(self):
+        """
+        Views of every array cut to the n live drops, as attributes of the same names. Also w_0 & w_t, the weights at
+        the current & next position as tuples, work_pair & near_pair, (work, work_2) & (near_r, near_c), and brush,
+        brush.Cut() of the brush() scratch for each radius.
+        """
+        n = self.n
+        names = self.STATE + self.SCRATCH + self.WEIGHTS + self.PREVIOUS + self.INDICES + self.CELLS + self.MASKS
+        d = types.SimpleNamespace(n = n, **{name: getattr(self, name)[:n] for name in names})
+        d.w_0 = tuple(getattr(d, name) for name in self.WEIGHTS[:4])
+        d.w_t = tuple(getattr(d, name) for name in self.WEIGHTS[4:])
+        d.work_pair, d.near_pair = (d.work, d.work_2), (d.near_r, d.near_c)
+        d.brush = {radius: brush.Cut(scratch, n) for radius, scratch in self._brush.items()}
+        return d
+
+    def compact(self, keep, extra = ()):
+        """
+        Moves the drops where keep is True (one entry per live drop) to the front, in order, and returns live().
+        The CARRIED arrays & those named in extra follow their drops, the rest are scratch.
+        """
+        n = self.n
+        k = int(np.count_nonzero(keep))
+        for name in self.CARRIED + tuple(extra):
+            array = getattr(self, name)
+            spare = self._spare[array.dtype]
+            np.compress(keep, array[:n], out = spare[:k])
+            array[:k] = spare[:k]
+        self.n = k
+        return self.live()
+
+    def brush(self, radius):
+        """
+        brush.Scratch arrays for this pool's capacity & dtype, made once per radius.
+        """
+        if radius not in self._brush:
+            self._brush[radius] = brush.Scratch(radius, self.capacity, self.dtype)
+        return self._brush[radius]
+
+    def droplet(self, i):
+        """
+        Drop i as a Droplet, for inspecting a batch while debugging.
+        """
+        return Droplet(self.pos_y[i], self.pos_x[i], self.vel_y[i], self.vel_x[i], self.speed[i], self.water[i],
+            self.sediment[i])
+
+
+_pools = {}
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def Borrow(capacity, dtype = float):
+    """
+    A DropletPool with at least capacity slots, taken from the free pools of that dtype & given back afterwards.
+    """
+    dtype = np.dtype(dtype)
+    with _lock:
+        free = _pools.setdefault(dtype, [])
+        fits = [pool for pool in free if pool.capacity >= capacity]
+        pool = min(fits, key = lambda pool: pool.capacity) if fits else None
+        if pool is not None:
+            free.remove(pool)
+    if pool is None:
+        pool = DropletPool(capacity, dtype)
+    try:
+        yield pool
+    finally:
+        pool.n = 0
+        with _lock:
+            _pools[dtype].append(pool)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
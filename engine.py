@@ -0,0 +1,575 @@
+#
+# 10/18/26
+# ---------------------------------------- Droplet Engines ----------------------------------------
+"""
+The droplet erosion loop, as a one-drop-at-a-time reference engine and a batched lockstep engine.
+"""
+# Both engines take a heightmap (eroded in place), drop start positions in cell coordinates
+# with shape (n, 2), and a parameter object with the names used in parameters.py.
+# They return the total number of movement steps taken. An optional bounds box (r0, r1, c0, c1)
+# kills drops whose next cell leaves it, the map edges are the default.
+#
+# The one-drop-at-a-time loop has pluggable backends (see Backend): 'reference' is the
+# NumPy/Python loop below and 'numba' is the compiled copy in kernels.py, imported on first use.
+#
+# With drop_sampling = 'bilinear' heights & gradients are interpolated at the drop's position and
+# deposits are split over the four cells around it (bilinear.py), the erosion brush stays centred on
+# the nearest cell. Drops then also die once their square of cells leaves the bounds.
+#
+# With drop_termination = True stalled, stuck & oscillating drops are ended early and their
+# sediment settled (termination.py).
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import math
+import time
+import numpy as np
+import warnings
+import gradient
+import brush
+import bilinear
+import termination
+import droplet
+import instrument
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Reference Engine ----------------------------------------
+
+def Erode(heightmap, positions, p, bounds = None, verbose = False, stats = None, field = None):
+    """
+    Simulates every drop to completion before starting the next one. stats is an optional instrument.Recorder.
+    field is a gradient.Gradient of heightmap kept between calls (see Field), made fresh when not given.
+    """
+    # Parameters, as scalars of the heightmap dtype so float32 maps are stepped in float32
+    ermap = heightmap
+    dtype = ermap.dtype
+    real = dtype.type
+    p_move_cap = p.drop_move_cap
+    p_drop_size = real(p.drop_initial_water)
+    p_evaporation = real(p.drop_initial_water / p.drop_move_cap)
+    p_initial_vel = p.rain_initial_vel
+    p_grav = real(p.world_gravity)
+    k_momentum = real(p.drop_momentum)
+    k_inertia = real(1 - p.drop_momentum)
+    k_water_cuttoff = real(p.water_cuttoff)
+    k_erosion_rate = real(p.erosion_rate)
+    k_capacity = real(p.sediment_capacity_multiplier)
+    k_deposition_rate = real(p.deposition_rate)
+    k_erode_radius = p.erosion_radius
+    k_min_slope_capacity = real(p.min_slope_capacity)
+    p_bilinear = bilinear.Enabled(p)
+    p_terminate, k_min_velocity, k_oscillation = termination.Thresholds(p)
+    k_min_velocity, k_oscillation = real(k_min_velocity), real(k_oscillation * k_oscillation)
+    one = real(1)
+
+    if p_bilinear:
+        b_r0, b_r1, b_c0, b_c1 = bilinear.Bounds(bounds, ermap.shape)
+    else:
+        b_r0, b_r1, b_c0, b_c1 = bounds or (0, ermap.shape[0], 0, ermap.shape[1])
+    if field is None:
+        field = gradient.Gradient(ermap)
+    steps = 0
+
+    # Instrumentation
+    timed = stats is not None
+    clock = time.perf_counter
+    t_gradient = t_movement = t_erode = t_deposit = 0.0
+    deaths = dict.fromkeys(instrument.DEATHS, 0)
+    eroded = deposited = 0.0
+    saved = 0
+
+    # Initializing drop
+    vel_y, vel_x = [real(v) for v in p_initial_vel]
+    for i, (pos_y, pos_x) in enumerate(positions):
+        if timed:
+            t0 = clock()
+        uy, ux = field.update()
+        if timed:
+            t_gradient += clock() - t0
+        drop = droplet.Droplet(real(pos_y), real(pos_x), vel_y, vel_x, real(math.sqrt(vel_y * vel_y + vel_x * vel_x)),
+            p_drop_size, real(0))
+        if p_bilinear:
+            r_0, c_0, w_0 = bilinear.Corners(drop.pos_y, drop.pos_x, one)
+
+        # Drop sequence
+        for t in range(p_move_cap):
+            if timed:
+                t0 = clock()
+            index_0 = (int(np.rint(drop.pos_y)), int(np.rint(drop.pos_x)))
+
+            # Calculating movement
+            if p_bilinear:
+                grad_y, grad_x = bilinear.Sample(uy, r_0, c_0, w_0), bilinear.Sample(ux, r_0, c_0, w_0)
+            else:
+                grad_y, grad_x = uy[index_0], ux[index_0]
+            drop.vel_y = drop.vel_y * k_momentum - grad_y * k_inertia
+            drop.vel_x = drop.vel_x * k_momentum - grad_x * k_inertia
+            norm_vel = real(math.sqrt(drop.vel_y * drop.vel_y + drop.vel_x * drop.vel_x))
+
+            # Moving drop, a drop that stopped dead (or too slow to carry on) has nowhere to go
+            moving = k_min_velocity < norm_vel < math.inf
+            if moving:
+                pos_y = drop.pos_y + drop.vel_y / norm_vel
+                pos_x = drop.pos_x + drop.vel_x / norm_vel
+                if p_bilinear:
+                    r_t, c_t, w_t = bilinear.Corners(pos_y, pos_x, one)
+                    index_t = (r_t, c_t)
+                else:
+                    index_t = (int(np.rint(pos_y)), int(np.rint(pos_x)))
+
+            # Checking if drop exists
+            if moving and b_r0 <= index_t[0] < b_r1 and b_c0 <= index_t[1] < b_c1 and drop.water > k_water_cuttoff:
+
+                # Determining erosion
+                if p_bilinear:
+                    del_h = bilinear.Sample(ermap, r_t, c_t, w_t) - bilinear.Sample(ermap, r_0, c_0, w_0)
+                else:
+                    del_h = ermap[index_t] - ermap[index_0]
+
+                # Ending stuck drops before they take the step
+                if p_terminate:
+                    if del_h > 0 and termination.Pit(ermap, *index_0):
+                        reason = 'pit'
+                    elif t > 0 and (pos_y - prev_y) * (pos_y - prev_y) + (pos_x - prev_x) * (pos_x - prev_x) < k_oscillation:
+                        reason = 'oscillating'
+                    else:
+                        reason = None
+                    if reason:
+                        if timed:
+                            t_movement += clock() - t0
+                        deaths[reason] += 1
+                        saved += p_move_cap - t
+                        termination.Settle(ermap, index_0, drop.sediment, k_erode_radius)
+                        field.touch(index_0, k_erode_radius)
+                        deposited += drop.sediment
+                        break
+                    prev_y, prev_x = drop.pos_y, drop.pos_x
+
+                steps += 1
+                drop.pos_y, drop.pos_x = pos_y, pos_x
+                carry_cap = max(k_min_slope_capacity, -del_h) * drop.speed * drop.water * k_capacity
+                if timed:
+                    t1 = clock()
+                    t_movement += t1 - t0
+
+                # Depositing sediment
+                if drop.sediment > carry_cap:
+                    deposit = (drop.sediment - carry_cap) * k_deposition_rate
+                    drop.sediment -= deposit
+                    if p_bilinear:
+                        w00, w01, w10, w11 = w_0
+                        ermap[r_0, c_0] += deposit * w00
+                        ermap[r_0, c_0 + 1] += deposit * w01
+                        ermap[r_0 + 1, c_0] += deposit * w10
+                        ermap[r_0 + 1, c_0 + 1] += deposit * w11
+                        field.touch((r_0, c_0), 1)
+                    else:
+                        ermap[index_0] += deposit
+                        field.touch(index_0)
+                    drop.speed = real(0)
+                    deposited += deposit
+                    if timed:
+                        t_deposit += clock() - t1
+
+                # Eroding sediment
+                else:
+                    erode = min((carry_cap - drop.sediment) * k_erosion_rate, -del_h)
+                    drop.sediment += erode
+                    drop.speed = real(math.sqrt(abs(drop.speed * drop.speed - del_h * p_grav)))
+                    field.touch(index_0, k_erode_radius)
+
+                    # Radius weighted erosion
+                    brush.Erode(ermap, index_0, erode, k_erode_radius)
+                    eroded += erode
+                    if timed:
+                        t_erode += clock() - t1
+
+                # Evaporating water
+                drop.water -= p_evaporation
+                if p_bilinear:
+                    r_0, c_0, w_0 = r_t, c_t, w_t
+
+            # Dead drops
+            else:
+                if timed:
+                    t_movement += clock() - t0
+                if not moving:
+                    deaths['stalled' if norm_vel <= k_min_velocity else 'degenerate'] += 1
+                    if p_terminate:
+                        saved += p_move_cap - t
+                        termination.Settle(ermap, index_0, drop.sediment, k_erode_radius)
+                        field.touch(index_0, k_erode_radius)
+                        deposited += drop.sediment
+                elif drop.water > k_water_cuttoff:
+                    deaths['out_of_bounds'] += 1
+                else:
+                    deaths['water_cutoff'] += 1
+                break
+        else:
+            deaths['move_cap'] += 1
+
+        # Counting progress
+        if verbose and i % 500 == 0:
+            print(i)
+        if timed:
+            stats.advance(1)
+
+    if timed:
+        stats.add({'gradient': t_gradient, 'movement': t_movement, 'erode': t_erode, 'deposit': t_deposit},
+            deaths, steps, eroded, deposited, saved)
+    return steps
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Batched Engine ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def ErodeBatch(heightmap, positions, p, batch_size = None, bounds = None, verbose = False, stats = None, field = None):
+    """
+    Advances batch_size drops together one step at a time, stored in a borrowed droplet.DropletPool.
+    Drops in a batch see the gradient from the start of the batch and the heights from the start of the step.
+    A batch size of 1 reproduces Erode exactly. stats is an optional instrument.Recorder, field as for Erode.
+    """
+    # Parameters, as scalars of the heightmap dtype so float32 maps are stepped in float32
+    dtype = heightmap.dtype
+    real = dtype.type
+    batch_size = batch_size or p.drop_batch_size
+    p_move_cap = p.drop_move_cap
+    p_drop_size = real(p.drop_initial_water)
+    p_evaporation = real(p.drop_initial_water / p.drop_move_cap)
+    p_grav = real(p.world_gravity)
+    k_momentum = real(p.drop_momentum)
+    k_inertia = real(1 - p.drop_momentum)
+    k_water_cuttoff = real(p.water_cuttoff)
+    k_erosion_rate = real(p.erosion_rate)
+    k_capacity = real(p.sediment_capacity_multiplier)
+    k_deposition_rate = real(p.deposition_rate)
+    k_erode_radius = p.erosion_radius
+    k_min_slope_capacity = real(p.min_slope_capacity)
+    p_bilinear = bilinear.Enabled(p)
+    p_terminate, k_min_velocity, k_oscillation = termination.Thresholds(p)
+    k_min_velocity, k_oscillation = real(k_min_velocity), real(k_oscillation * k_oscillation)
+    one = real(1)
+
+    # Cells are read & written through flat indices, so the map has to be contiguous
+    ermap = heightmap if heightmap.flags.c_contiguous else np.ascontiguousarray(heightmap)
+    flat_map = ermap.reshape(-1)
+    rows, cols = ermap.shape
+    if p_bilinear:
+        b_r0, b_r1, b_c0, b_c1 = bilinear.Bounds(bounds, ermap.shape)
+    else:
+        b_r0, b_r1, b_c0, b_c1 = bounds or (0, rows, 0, cols)
+    if field is None or field.heightmap is not ermap:
+        field = gradient.Gradient(ermap)
+    steps = 0
+
+    # Cells drops stood on since the gradient was last updated, each may have been eroded or deposited around
+    touched = np.zeros(rows * cols, bool)
+    touch_radius = max(k_erode_radius, 1) if p_bilinear else k_erode_radius
+
+    initial_vel = np.array(p.rain_initial_vel, dtype = dtype)
+    initial_speed = real(math.sqrt(initial_vel[0] * initial_vel[0] + initial_vel[1] * initial_vel[1]))
+
+    # Instrumentation
+    timed = stats is not None
+    clock = time.perf_counter
+    t_gradient = t_movement = t_erode = t_deposit = 0.0
+    deaths = dict.fromkeys(instrument.DEATHS, 0)
+    eroded = deposited = 0.0
+    saved = 0
+
+    # Arrays that follow the drops when dead drops are dropped from the pool, & when stuck drops are
+    carried = (droplet.DropletPool.BILINEAR if p_bilinear else ()) + (droplet.DropletPool.PREVIOUS if p_terminate else ())
+    carried_stuck = carried + ('del_h',) + (('cell_t',) + droplet.DropletPool.WEIGHTS[4:] if p_bilinear else ())
+
+    with droplet.Borrow(batch_size, dtype) as pool, np.errstate(divide = 'ignore', invalid = 'ignore'):
+        pool.brush(k_erode_radius)
+        for start in range(0, len(positions), batch_size):
+            if timed:
+                t0 = clock()
+            if touched.any():
+                cells = np.flatnonzero(touched)
+                field.touch_many(cells // cols, cells % cols, touch_radius)
+                touched[:] = False
+            uy, ux = field.update()
+            uy, ux = uy.reshape(-1), ux.reshape(-1)
+            if timed:
+                t_gradient += clock() - t0
+
+            # Drop state
+            d = pool.fill(np.asarray(positions[start:start + batch_size], dtype = dtype), initial_vel, initial_speed,
+                p_drop_size)
+            scratch = d.brush[k_erode_radius]
+            if p_bilinear:
+                bilinear.CornersMany(d.pos_y, d.pos_x, d.row_t, d.col_t, d.w_0, d.work_pair, one)
+                np.add(np.multiply(d.row_t, cols, out = d.cell_0), d.col_t, out = d.cell_0)
+
+            # Drop sequence, every operation writes into the pool's arrays
+            for t in range(p_move_cap):
+                if d.n == 0:
+                    break
+                if timed:
+                    t0 = clock()
+                np.copyto(d.row_0, np.rint(d.pos_y, out = d.work), casting = 'unsafe')
+                np.copyto(d.col_0, np.rint(d.pos_x, out = d.work), casting = 'unsafe')
+                np.add(np.multiply(d.row_0, cols, out = d.flat_0), d.col_0, out = d.flat_0)
+
+                # Calculating movement
+                for vel, grad_map in ((d.vel_y, uy), (d.vel_x, ux)):
+                    if p_bilinear:
+                        bilinear.SampleMany(grad_map, d.cell_0, cols, d.w_0, d.grad, d.work, d.corner)
+                    else:
+                        np.take(grad_map, d.flat_0, out = d.grad)
+                    np.multiply(d.grad, k_inertia, out = d.grad)
+                    np.subtract(np.multiply(vel, k_momentum, out = vel), d.grad, out = vel)
+                np.multiply(d.vel_y, d.vel_y, out = d.norm)
+                np.add(d.norm, np.multiply(d.vel_x, d.vel_x, out = d.work), out = d.norm)
+                np.sqrt(d.norm, out = d.norm)
+
+                # Moving drops
+                np.add(d.pos_y, np.divide(d.vel_y, d.norm, out = d.pos_ty), out = d.pos_ty)
+                np.add(d.pos_x, np.divide(d.vel_x, d.norm, out = d.pos_tx), out = d.pos_tx)
+                if p_bilinear:
+                    np.copyto(d.row_t, np.floor(d.pos_ty, out = d.work), casting = 'unsafe')
+                    np.copyto(d.col_t, np.floor(d.pos_tx, out = d.work), casting = 'unsafe')
+                else:
+                    np.copyto(d.row_t, np.rint(d.pos_ty, out = d.work), casting = 'unsafe')
+                    np.copyto(d.col_t, np.rint(d.pos_tx, out = d.work), casting = 'unsafe')
+
+                # Retiring dead drops, a drop that stopped dead (or too slow to carry on) has nowhere to go
+                alive, mask = d.alive, d.mask
+                np.greater(d.norm, k_min_velocity, out = alive)
+                np.logical_and(alive, np.less(d.norm, np.inf, out = mask), out = alive)
+                np.logical_and(alive, np.greater_equal(d.row_t, b_r0, out = mask), out = alive)
+                np.logical_and(alive, np.less(d.row_t, b_r1, out = mask), out = alive)
+                np.logical_and(alive, np.greater_equal(d.col_t, b_c0, out = mask), out = alive)
+                np.logical_and(alive, np.less(d.col_t, b_c1, out = mask), out = alive)
+                np.logical_and(alive, np.greater(d.water, k_water_cuttoff, out = mask), out = alive)
+                if not alive.all():
+                    if timed or p_terminate:
+                        moving = (d.norm > k_min_velocity) & (d.norm < np.inf)
+                    if timed:
+                        stalled = d.norm <= k_min_velocity
+                        wet = d.water > k_water_cuttoff
+                        deaths['stalled'] += np.count_nonzero(stalled)
+                        deaths['degenerate'] += np.count_nonzero(~moving & ~stalled)
+                        deaths['out_of_bounds'] += np.count_nonzero(~alive & moving & wet)
+                        deaths['water_cutoff'] += np.count_nonzero(~alive & moving & ~wet)
+
+                    # Stopped drops settle their sediment
+                    if p_terminate and not moving.all():
+                        saved += np.count_nonzero(~moving) * (p_move_cap - t)
+                        np.multiply(d.sediment, np.logical_not(moving, out = mask), out = d.amount)
+                        if timed:
+                            deposited += d.amount.sum(dtype = float)
+                        termination.SettleMany(ermap, d.row_0, d.col_0, d.amount, k_erode_radius, scratch, d.amount)
+                        np.put(touched, d.flat_0, True)
+                    d = pool.compact(alive, carried)
+                    scratch = d.brush[k_erode_radius]
+
+                # Determining erosion
+                if p_bilinear:
+                    bilinear.CornersMany(d.pos_ty, d.pos_tx, d.row_t, d.col_t, d.w_t, d.work_pair, one)
+                    np.add(np.multiply(d.row_t, cols, out = d.cell_t), d.col_t, out = d.cell_t)
+                    bilinear.SampleMany(flat_map, d.cell_t, cols, d.w_t, d.ht, d.work, d.corner)
+                    bilinear.SampleMany(flat_map, d.cell_0, cols, d.w_0, d.h0, d.work, d.corner)
+                else:
+                    np.add(np.multiply(d.row_t, cols, out = d.flat_t), d.col_t, out = d.flat_t)
+                    np.take(flat_map, d.flat_t, out = d.ht)
+                    np.take(flat_map, d.flat_0, out = d.h0)
+                np.subtract(d.ht, d.h0, out = d.del_h)
+
+                # Ending stuck drops before they take the step, they settle their sediment
+                if p_terminate:
+                    stop, pit = d.stop, d.pit
+                    termination.PitsMany(flat_map, d.row_0, d.col_0, ermap.shape, pit, d.work, d.work_2, d.near_pair)
+                    np.logical_and(pit, np.greater(d.del_h, 0, out = stop), out = pit)
+                    if t > 0:
+                        np.subtract(d.pos_ty, d.prev_y, out = d.work)
+                        np.subtract(d.pos_tx, d.prev_x, out = d.work_2)
+                        np.add(np.multiply(d.work, d.work, out = d.work), np.multiply(d.work_2, d.work_2, out = d.work_2),
+                            out = d.work)
+                        np.less(d.work, k_oscillation, out = stop)
+                        np.logical_or(stop, pit, out = stop)
+                    else:
+                        np.copyto(stop, pit)
+                    if stop.any():
+                        deaths['pit'] += np.count_nonzero(pit)
+                        deaths['oscillating'] += np.count_nonzero(stop) - np.count_nonzero(pit)
+                        saved += np.count_nonzero(stop) * (p_move_cap - t)
+                        np.multiply(d.sediment, stop, out = d.amount)
+                        if timed:
+                            deposited += d.amount.sum(dtype = float)
+                        termination.SettleMany(ermap, d.row_0, d.col_0, d.amount, k_erode_radius, scratch, d.amount)
+                        np.put(touched, d.flat_0, True)
+                        d = pool.compact(np.logical_not(stop, out = d.mask), carried_stuck)
+                        scratch = d.brush[k_erode_radius]
+                steps += d.n
+                np.negative(d.del_h, out = d.fall)
+                carry_cap = np.maximum(d.fall, k_min_slope_capacity, out = d.carry)
+                np.multiply(np.multiply(np.multiply(carry_cap, d.speed, out = carry_cap), d.water, out = carry_cap),
+                    k_capacity, out = carry_cap)
+                depositing = np.greater(d.sediment, carry_cap, out = d.depositing)
+                eroding = np.logical_not(depositing, out = d.eroding)
+                if timed:
+                    t1 = clock()
+                    t_movement += t1 - t0
+
+                # Depositing sediment, eroding drops deposit 0
+                if depositing.any():
+                    deposit = np.subtract(d.sediment, carry_cap, out = d.amount)
+                    np.multiply(deposit, k_deposition_rate, out = deposit)
+                    np.copyto(deposit, 0, where = eroding)
+                    np.subtract(d.sediment, deposit, out = d.sediment)
+                    if p_bilinear:
+                        bilinear.ScatterMany(flat_map, d.cell_0, cols, d.w_0, deposit, d.work, d.corner)
+                        np.put(touched, d.cell_0, True)
+                    else:
+                        np.add.at(flat_map, d.flat_0, deposit)
+                    np.copyto(d.speed, 0, where = depositing)
+                    if timed:
+                        deposited += deposit.sum(dtype = float)
+                if timed:
+                    t2 = clock()
+                    t_deposit += t2 - t1
+
+                # Eroding sediment, depositing drops erode 0
+                if eroding.any():
+                    erode = np.subtract(carry_cap, d.sediment, out = d.amount)
+                    np.minimum(np.multiply(erode, k_erosion_rate, out = erode), d.fall, out = erode)
+                    np.copyto(erode, 0, where = depositing)
+                    np.add(d.sediment, erode, out = d.sediment)
+                    speed = np.multiply(d.speed, d.speed, out = d.work)
+                    np.subtract(speed, np.multiply(d.del_h, p_grav, out = d.work_2), out = speed)
+                    np.sqrt(np.abs(speed, out = speed), out = speed)
+                    np.copyto(d.speed, speed, where = eroding)
+
+                    # Radius weighted erosion
+                    brush.ErodeMany(ermap, d.row_0, d.col_0, erode, k_erode_radius, scratch)
+                    if timed:
+                        eroded += erode.sum(dtype = float)
+                if timed:
+                    t_erode += clock() - t2
+
+                np.put(touched, d.flat_0, True)
+
+                # Evaporating water
+                np.subtract(d.water, p_evaporation, out = d.water)
+                if p_terminate:
+                    np.copyto(d.prev_y, d.pos_y)
+                    np.copyto(d.prev_x, d.pos_x)
+                np.copyto(d.pos_y, d.pos_ty)
+                np.copyto(d.pos_x, d.pos_tx)
+                if p_bilinear:
+                    np.copyto(d.cell_0, d.cell_t)
+                    np.copyto(d.w00, d.wt00)
+                    np.copyto(d.w01, d.wt01)
+                    np.copyto(d.w10, d.wt10)
+                    np.copyto(d.w11, d.wt11)
+
+            # Counting progress
+            if verbose:
+                for i in range(start + (-start) % 500, start + batch_size, 500):
+                    print(i)
+            if timed:
+                deaths['move_cap'] += d.n
+                stats.advance(min(batch_size, len(positions) - start))
+
+    # The last batch's cells, for a field kept for the next call
+    if touched.any():
+        cells = np.flatnonzero(touched)
+        field.touch_many(cells // cols, cells % cols, touch_radius)
+    if ermap is not heightmap:
+        heightmap[...] = ermap
+    if timed:
+        stats.add({'gradient': t_gradient, 'movement': t_movement, 'erode': t_erode, 'deposit': t_deposit},
+            deaths, steps, eroded, deposited, saved)
+    return steps
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Backends ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def _numba(heightmap, positions, p, bounds = None, verbose = False, stats = None, field = None):
+    # kernels.py (and numba) is only imported once the numba backend is used, it takes a while to load
+    import kernels
+    return kernels.Erode(heightmap, positions, p, bounds, verbose, stats, field)
+
+
+BACKENDS = {
+    'reference': Erode,
+    'numba': _numba,
+}
+
+# erosion_engine names, every drop engine above is 'droplet'
+ENGINES = ('droplet', 'pipe', 'stream')
+
+
+def Backend(name):
+    """
+    The one-drop-at-a-time engine registered under name. Falls back to 'reference' when numba isn't installed.
+    """
+    if name not in BACKENDS:
+        raise ValueError('unknown backend %r, expected one of %s' % (name, ', '.join(BACKENDS)))
+    if name == 'numba':
+        import kernels
+    if name == 'numba' and not kernels.available:
+        warnings.warn('numba is not installed, using the reference backend')
+        name = 'reference'
+    return BACKENDS[name]
+
+
+def Erosion(p):
+    """
+    The engine p selects, as f(heightmap, positions, p, bounds, verbose, stats, field): the grid model for
+    erosion_engine = 'pipe', stream power for 'stream', tiled when tile_processes > 0, batched when drop_batch_size > 1,
+    otherwise the drop_backend loop. Tiled erosion splits the map itself and takes no bounds, field is the one from
+    Field() & is ignored by the engines without one.
+    """
+    if p.erosion_engine not in ENGINES:
+        raise ValueError('unknown erosion_engine %r, expected one of %s' % (p.erosion_engine, ', '.join(ENGINES)))
+    if p.erosion_engine == 'pipe':
+        import pipe
+        return lambda heightmap, positions, p, bounds = None, verbose = False, stats = None, field = None: pipe.Erode(
+            heightmap, positions, p, bounds, verbose, stats)
+    if p.erosion_engine == 'stream':
+        import flow
+        flow.Compiled() # fails here rather than after the terrain is made
+        return lambda heightmap, positions, p, bounds = None, verbose = False, stats = None, field = None: flow.Erode(
+            heightmap, positions, p, bounds, verbose, stats)
+    if p.tile_processes > 0:
+        import tiled # tiled imports this module
+        return lambda heightmap, positions, p, verbose = False, stats = None, field = None: tiled.Erode(heightmap,
+            positions, p, p.tile_processes, verbose, stats)
+    if p.drop_batch_size > 1:
+        return lambda heightmap, positions, p, bounds = None, verbose = False, stats = None, field = None: ErodeBatch(
+            heightmap, positions, p, p.drop_batch_size, bounds, verbose, stats, field)
+    backend = Backend(p.drop_backend)
+    return lambda heightmap, positions, p, bounds = None, verbose = False, stats = None, field = None: backend(
+        heightmap, positions, p, bounds, verbose, stats, field)
+
+
+def Field(p, heightmap):
+    """
+    A gradient.Gradient of heightmap for the Erosion(p) engine to keep up to date over calls on that map, instead of
+    computing the whole gradient every call. None for the engines without one (pipe, stream & tiled).
+    """
+    if p.erosion_engine != 'droplet' or p.tile_processes > 0:
+        return None
+    return gradient.Gradient(heightmap)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
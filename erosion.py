@@ -3,12 +3,35 @@
 # ---------------------------------------- Erosion Simulation ----------------------------------------
 """
 Simulating erosion on procedularly generated terrain. 
+Run as a script for one simulation, or import Simulator to run many in one process.
 """
 # To-do:
 #   6/3/19 -- Need to speed up distance-weighted erosion, currently utilizes nested for loop
+#       --> done, see brush.py
 #       --> want to add gaussian blur to final image (scipy.ndimage.filters.gaussian_filter)
 #   6/24/19 -- Finished preliminary implementation of erosion & README
 #   7/1/19 -- Moved parameters to separate file & started droplet class
+#       --> done, see droplet.py (__slots__ Droplet & a preallocated DropletPool for the batched engine)
+#   10/18/26 -- Gradient kept up to date locally (gradient.py) instead of np.gradient every drop
+#   10/18/26 -- Moved the drop loop to engine.py & added a batched lockstep engine
+#   10/18/26 -- Erosion radius uses cached, normalised & edge-clipped kernels (brush.py)
+#   10/18/26 -- Pluggable drop backends, numba-compiled loop in kernels.py
+#   10/18/26 -- Multi-process tiled erosion over shared memory (tiled.py)
+#   10/18/26 -- map_dtype carried through noise, heightmap & drop loop
+#   10/18/26 -- Periodic checkpoints & resume for long runs (checkpoint.py)
+#   10/18/26 -- Headless mode, mayavi imported lazily (render.py) & binary export (export.py)
+#   10/18/26 -- Importable Simulator, the script part only runs under __main__
+#   10/18/26 -- Optional phase timers, drop counters & progress callbacks (instrument.py)
+#   10/18/26 -- Base terrains cached on disk by noise parameters (cache.py)
+#   10/18/26 -- Bilinear height/gradient sampling & deposition, drop_sampling = 'bilinear' (bilinear.py)
+#   10/18/26 -- Early termination of stalled, stuck & oscillating drops (termination.py)
+#   10/18/26 -- Importance-sampled rain spawning (spawn.py) & D8 flow accumulation (flow.py)
+#   10/18/26 -- Grid-based shallow-water pipe model engine, erosion_engine = 'pipe' (pipe.py)
+#   10/18/26 -- Depression filling & implicit stream power erosion, erosion_engine = 'stream' (flow.py)
+#   10/18/26 -- Coarse-to-fine multi-resolution erosion, multires_levels > 1 (multires.py)
+#   10/18/26 -- Noise & rain drawn from independent SeedSequence streams (streams.py), no global RNG
+#   10/18/26 -- Lazy windowed import & erosion of large external heightmaps (dem.py)
+#   10/18/26 -- Blur, export & render moved to Finish() so checkpoint.py can finish resumed runs
 #
 # ----------------------------------------------------------------------------------------------------
 # ----------------------------------------------------------------------------------------------------
@@ -16,161 +39,162 @@ Simulating erosion on procedularly generated terrain.
 
 # ---------------------------------------- IMPORTS ----------------------------------------
 
+import time
+cold_start = time.perf_counter()
+
+import json
+import contextlib
 import noise
+import cache
+import engine
+import checkpoint
+import export
+import render
+import spawn
+import multires
+import instrument
 import numpy as np
-import math
-from mayavi import mlab
-from itertools import product
 from scipy import ndimage
+import settings
 import parameters as param
 
 
-# ---------------------------------------- PARAMETERS ----------------------------------------
-
-# Noise parameters
-grid = param.noise_scale
-res = param.terrain_reolution
-oct = param.noise_octaves
-lanc = param.noise_lacunarity
-pers = param.noise_persistance
-map_seed = param.map_seed
-
-# Rain parameters
-p_num_drops = param.drop_iterations
-p_move_cap = param.drop_move_cap
-p_drop_size = param.drop_initial_water
-p_drop_seed = param.rain_seed
-p_initial_vel = param.rain_initial_vel
-
-# Movement parameters
-p_grav = param.world_gravity
-k_momentum = param.drop_momentum
-k_water_cuttoff = param.water_cuttoff
-
-# Erosion parameters
-k_erosion_rate = param.erosion_rate
-k_capacity = param.sediment_capacity_multiplier
-k_deposition_rate =  param.deposition_rate
-k_erode_radius = param.erosion_radius
-k_min_slope_capacity = param.min_slope_capacity
-
-# Board parameters
-colormap = param.map_colormap
-z_scale = param.map_z_scale
-board_scale = param.map_board_scale
-blur = param.processing_blur
-
-
 
 
 # ---------------------------------------- LOADING MAP ----------------------------------------
 
-# Noise map
-noise_raw = noise.Octave(res, oct, lanc, pers, map_seed)
-mapp = noise_raw[1:-2,1:-2] #removing edge artifacts
+def Terrain(p = param):
+    """
+    The fractal noise map the parameters describe, in map_dtype. Read-only & memory-mapped when
+    terrain_cache_dir is set (cache.py).
+    """
+    if p.terrain_cache_dir:
+        return cache.Terrain(p, _generate)
+    return _generate(p)
 
-# Simulating generation
-ermap = mapp
 
-# Generating drops
-np.random.seed(p_drop_seed)
-drops = np.random.rand(p_num_drops, 2)
+def _generate(p):
+    noise_raw = noise.Octave(p.terrain_reolution, p.noise_octaves, p.noise_lacunarity, p.noise_persistance, p.map_seed,
+        p.noise_threads, p.map_dtype)
+    return noise_raw[1:-2,1:-2] #removing edge artifacts
 
 
 
 
 # ---------------------------------------- EROSION PROCESS ----------------------------------------
 
-# Counting progress (1/2)
-i = 0
-
-# Initializing drop
-for drop in drops:
-    uy, ux = np.gradient(ermap)
-    pos_t = [(res - 3) * drop[0], (res - 3) * drop[1]] #updated to (res-3) due to rounding errors
-    index_0 = tuple(np.rint(pos_t).astype(int))
-    vel = np.array(p_initial_vel)
-    speed = np.linalg.norm(vel)
-    water_cap = p_drop_size
-    carry_cap = 0
-    sed_carry = 0
-
-    # Drop sequence
-    for t in range(p_move_cap):
-        pos_0 = pos_t
-        index_0 = tuple(np.rint(pos_t).astype(int))
-
-        # Calculating movement
-        grad = np.array([uy[index_0], ux[index_0]])
-        vel = vel * k_momentum - grad * (1 - k_momentum)
-        norm_vel = np.linalg.norm(vel)
-
-        # Moving drop
-        pos_t = pos_0 + vel / norm_vel
-        index_t = tuple(np.rint(pos_t).astype(int))
-        
-        # Checking if drop exists
-        if min(index_t) >= 0 and max(index_t) < (res - 2) and water_cap > k_water_cuttoff:
-
-            # Determining erosion
-            h1 = ermap[index_0]
-            h2 = ermap[index_t]
-            del_h = h2 - h1
-            carry_cap = max(k_min_slope_capacity, -del_h) * speed * water_cap * k_capacity
-
-            # Depositing sediment
-            if sed_carry > carry_cap:
-                deposit = (sed_carry - carry_cap) * k_deposition_rate
-                sed_carry -= deposit
-                ermap[index_0] += deposit
-                speed = 0
-
-            # Eroding sediment
-            else:
-                erode = min((carry_cap - sed_carry) * k_erosion_rate, -del_h)
-                sed_carry += erode
-                speed = math.sqrt(abs(speed ** 2 - del_h * p_grav))
-                weight_norm = 4 * (math.pi * k_erode_radius ** 2) / 3
-
-                # Radius weighted erosion
-                for x, y in product(range(1, k_erode_radius + 1), range(1, k_erode_radius + 1)):
-                    # Equivalent of nested for loop
-                    if np.linalg.norm(np.array([x, y])) <= k_erode_radius:
-                        index_i = tuple([index_0[0] + x, index_0[1] + y])
-                        index_j = tuple([index_0[0] - x, index_0[1] - y])
-                        wi = k_erode_radius - abs(np.linalg.norm(np.array([index_i[0] - index_0[0], index_i[1] - index_0[1]])))
-                        wj = k_erode_radius - abs(np.linalg.norm(np.array([index_j[0] - index_0[0], index_j[1] - index_0[1]])))
-                        try:
-                            ermap[index_i] -= wi * erode / weight_norm
-                            ermap[index_j] -= wj * erode / weight_norm
-                        except:
-                            continue
-
-            # Evaporating water
-            water_cap -= p_drop_size / p_move_cap
-
-        # Dead drops
+class Simulator:
+    """
+    Rains drops on a heightmap (generated from p when not given) in as many run() or step() calls as wanted.
+    Drops come from the rain_seed streams (streams.py), so any split of the same drops gives the same map as a single run(),
+    except with drop_batch_size > 1 or tiles, where lockstep batches & tile rounds restart with every call.
+    Weighted rain_distributions are computed from the map at the first run() after a reset. The drop engines' gradient
+    & the rain block being drawn are kept between calls, so step() costs about one drop. Call reset() after changing
+    heightmap other than through run() & step().
+    stats is an instrument.Recorder, one is made when p.instrument is set.
+    """
+
+    def __init__(self, p = param, heightmap = None, stats = None):
+        self.p = settings.Namespace(p)
+        self.erode = engine.Erosion(self.p)
+        self.stats = stats or (instrument.Recorder() if self.p.instrument else None)
+        self.heightmap = None
+        self.reset(heightmap)
+
+    def reset(self, heightmap = None):
+        """
+        Starts over on a new heightmap, reusing the current array when the shape & dtype match.
+        """
+        if heightmap is None:
+            with self.phase('noise'):
+                heightmap = Terrain(self.p)
+        heightmap = np.asarray(heightmap, dtype = self.p.map_dtype)
+        if self.heightmap is not None and self.heightmap.shape == heightmap.shape:
+            self.heightmap[:] = heightmap
         else:
-            break
-
-    # Counting progress (2/2)    
-    if i % 500 == 0:
-        print(i) 
-    i += 1
-
-"""
-Apply erosion radius normalization as volume of cone with fixed height 1 and variable radius R
-V = 1/3 h * pi R^2
-"""
-
-
-
-# ---------------------------------------- PLOTTING MAP ----------------------------------------
-
-# Blurring
-ermap = ndimage.filters.gaussian_filter(ermap, blur)
-
-# Mayavi surface (GEN 0)
-e = mlab.surf(ermap, colormap = colormap, extent = [0, board_scale, 0, board_scale, 0, z_scale])
-e.module_manager.scalar_lut_manager.reverse_lut = True
-mlab.show()
\ No newline at end of file
+            self.heightmap = np.array(heightmap)
+        self.spawner = None
+        self.field = engine.Field(self.p, self.heightmap)
+        self.next_drop = 0
+        self.steps = 0
+        return self
+
+    def run(self, n_drops = None, verbose = False):
+        """
+        Simulates the next n_drops drops (the remaining drop_iterations by default) and returns the eroded heightmap.
+        """
+        if n_drops is None:
+            n_drops = max(self.p.drop_iterations - self.next_drop, 0)
+        if self.spawner is None:
+            self.spawner = spawn.Spawner(self.p, self.heightmap)
+        drops = self.spawner.draw(n_drops, self.next_drop)
+        self.steps += self.erode(self.heightmap, drops, self.p, verbose = verbose, stats = self.stats,
+            field = self.field)
+        self.next_drop += n_drops
+        return self.heightmap
+
+    def step(self):
+        """
+        Simulates a single drop.
+        """
+        return self.run(1)
+
+    def phase(self, name):
+        """
+        Times a block under name when instrumented.
+        """
+        return self.stats.phase(name) if self.stats else contextlib.nullcontext()
+
+
+
+
+# ---------------------------------------- POST PROCESSING ----------------------------------------
+
+def Finish(ermap, p = param, stats = None):
+    """
+    Blurs an eroded map, exports & renders it as p says and reports stats, returning the blurred map.
+    """
+    phase = lambda name: stats.phase(name) if stats else contextlib.nullcontext()
+
+    # Blurring
+    with phase('blur'):
+        ermap = ndimage.filters.gaussian_filter(ermap, p.processing_blur)
+
+    # Binary export (export.py)
+    if p.export_path:
+        export.Export(p.export_path, ermap, p.export_formats, p)
+
+    # Mayavi surface (render.py), only imported here so headless runs never load it
+    if not p.render_headless:
+        with phase('render'):
+            render.Show(ermap, p)
+
+    # Run summary
+    if stats and p.instrument_path:
+        stats.save(p.instrument_path)
+    elif stats:
+        print(json.dumps(stats.summary(), indent = 2))
+    return ermap
+
+
+
+
+# ---------------------------------------- RUNNING ----------------------------------------
+
+if __name__ == '__main__':
+    # Instrumented runs report progress through the recorder instead of printing in the engines
+    stats = instrument.Recorder(instrument.Print) if param.instrument else None
+    verbose = stats is None
+    simulator = Simulator(param, stats = stats)
+    print('cold start to first drop: %.3f s' % (time.perf_counter() - cold_start))
+
+    # With a checkpoint path the run is saved periodically, resume it with: python checkpoint.py <path>
+    if param.checkpoint_path:
+        ermap = checkpoint.Run(simulator.heightmap, simulator.p, verbose = verbose, stats = stats)
+    elif param.multires_levels > 1:
+        ermap = simulator.heightmap
+        simulator.steps += multires.Erode(ermap, simulator.p, verbose, stats)
+    else:
+        ermap = simulator.run(verbose = verbose)
+
+    ermap = Finish(ermap, param, stats)
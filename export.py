@@ -0,0 +1,102 @@
+#
+# 10/18/26
+# ---------------------------------------- Heightmap Export ----------------------------------------
+"""
+Writing eroded heightmaps to .npy, 16-bit greyscale PNG and raw little-endian float32 with a JSON sidecar.
+"""
+# Nothing here needs a display or an imaging library: the PNG is encoded with zlib & struct.
+# The PNG stretches the map's min-max range over 0-65535, the sidecar records that range so
+# heights can be recovered as low + value / 65535 * (high - low).
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import json
+import zlib
+import struct
+import numpy as np
+import settings
+import parameters as param
+
+FORMATS = ('npy', 'png', 'raw')
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Formats ----------------------------------------
+
+def Npy(path, heightmap):
+    """
+    Saves the heightmap as a .npy in its own dtype.
+    """
+    np.save(path, heightmap)
+
+
+def Png16(path, heightmap, low = None, high = None):
+    """
+    Saves the heightmap as a 16-bit greyscale PNG, mapping low-high (the map's range by default) to 0-65535.
+    """
+    low = float(heightmap.min()) if low is None else low
+    high = float(heightmap.max()) if high is None else high
+    scale = 65535 / (high - low) if high > low else 0
+    values = np.rint((np.clip(heightmap, low, high) - low) * scale).astype('>u2')
+
+    # Every scanline starts with filter type 0
+    rows = np.zeros((values.shape[0], 1 + 2 * values.shape[1]), np.uint8)
+    rows[:, 1:] = values.view(np.uint8).reshape(values.shape[0], -1)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', values.shape[1], values.shape[0], 16, 0, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
+    return low, high
+
+
+def Raw(path, heightmap):
+    """
+    Dumps the heightmap as headerless little-endian float32, row by row.
+    """
+    np.ascontiguousarray(heightmap, dtype = '<f4').tofile(path)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Exporting ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Export(base, heightmap, formats = FORMATS, p = param):
+    """
+    Writes base.npy, base.png and/or base.raw plus base.json describing them & the parameters. Returns the paths written.
+    """
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError('unknown export formats %s, expected any of %s' % (', '.join(sorted(unknown)), ', '.join(FORMATS)))
+    meta = {'shape': list(heightmap.shape), 'dtype': heightmap.dtype.name, 'files': {}}
+
+    if 'npy' in formats:
+        Npy(base + '.npy', heightmap)
+        meta['files']['npy'] = {'path': base + '.npy'}
+    if 'png' in formats:
+        low, high = Png16(base + '.png', heightmap)
+        meta['files']['png'] = {'path': base + '.png', 'bit_depth': 16, 'low': low, 'high': high}
+    if 'raw' in formats:
+        Raw(base + '.raw', heightmap)
+        meta['files']['raw'] = {'path': base + '.raw', 'dtype': '<f4', 'order': 'C', 'shape': list(heightmap.shape)}
+    paths = [f['path'] for f in meta['files'].values()]
+
+    meta['parameters'] = vars(settings.Namespace(p))
+    with open(base + '.json', 'w') as f:
+        json.dump(meta, f, indent = 2)
+    return paths + [base + '.json']
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
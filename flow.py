@@ -0,0 +1,196 @@
+#
+# 10/18/26
+# ---------------------------------------- Flow Routing ----------------------------------------
+"""
+D8 flow directions, depression filling, flow accumulation & stream power erosion over a heightmap.
+"""
+# Every cell drains to the neighbour (of 8) with the steepest descent, drop over distance, or to
+# itself when no neighbour is lower (pits, flats & cells whose only lower neighbours are off the map).
+# Accumulation walks the cells from the highest down, adding each cell's area to its receiver's, so
+# a cell ends up with the number of cells (or the summed weights) that drain through it.
+#
+# Fill is a priority-flood (Barnes, Lehman & Mulla 2014) inward from the map edges: cells are
+# flooded lowest first and raised to epsilon above the cell they were reached from, so with
+# epsilon > 0 every cell has a lower neighbour and drains off the map. The flooding order is sorted
+# by filled height, which makes it a topological order of the drainage (receivers first) for free,
+# O(N log N) with no repeated sweeps. Stack gives such an order for any receivers in linear time, depth
+# first from the outlets so each drainage basin stays together in memory.
+#
+# erosion_engine = 'stream' carves the map with the stream power law dh/dt = -K A^m S, solved
+# implicitly (Braun & Willett 2013): walking receivers first,
+#   h = (h + F h_receiver) / (1 + F),   F = K dt A^m / distance
+# which is stable for any dt. Every call fills a copy of the map once for routing (carving never
+# makes new depressions), then each step routes & accumulates the drainage area A in cells & carves
+# the filled copy. Only the change carving made is added to the map, so the fill never raises the
+# terrain and basins keep their shape. Drops only set how much of the
+# run a call covers, like the pipe model (pipe.py): a call with n drops runs
+# stream_iterations * n / drop_iterations steps (at least 1) over that share of stream_erodibility.
+#
+# The loops are compiled in kernels.py. Without numba, Receivers & Accumulation fall back to NumPy
+# (array operations over the 8 neighbours, & accumulation a front of finished cells at a time) so
+# rain_distribution = 'flow' still works, while filling, Stack & stream power need numba and say so.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import math
+import time
+import numpy as np
+
+# Neighbour offsets & their distances
+NEIGHBOURS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+DISTANCES = tuple(math.sqrt(dy * dy + dx * dx) for dy, dx in NEIGHBOURS)
+_NEIGHBOURS, _DISTANCES = np.array(NEIGHBOURS, np.int64), np.array(DISTANCES)
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Directions ----------------------------------------
+
+def Compiled():
+    """
+    The kernels module, raising ImportError without numba for the loops that have no NumPy fallback.
+    """
+    import kernels
+    if not kernels.available:
+        raise ImportError('depression filling & stream power need numba, install it or pick another erosion_engine')
+    return kernels
+
+
+def Receivers(heightmap):
+    """
+    Flat index of the cell each cell drains to, its own index when it has no lower neighbour.
+    """
+    import kernels # the loops are compiled when numba is installed
+    if not kernels.available:
+        return _receivers(heightmap)
+    receivers = np.empty(heightmap.size, np.int64)
+    kernels.Receivers(np.asarray(heightmap), receivers, _NEIGHBOURS, _DISTANCES)
+    return receivers
+
+
+def _receivers(heightmap):
+    # Receivers with array operations, one neighbour at a time
+    rows, cols = heightmap.shape
+    heightmap = np.asarray(heightmap, dtype = float)
+    padded = np.pad(heightmap, 1, constant_values = np.inf)
+    index = np.arange(rows * cols).reshape(rows, cols)
+    receivers = index.copy()
+    steepest = np.zeros((rows, cols))
+    for (dy, dx), distance in zip(NEIGHBOURS, DISTANCES):
+        slope = (heightmap - padded[1 + dy:1 + dy + rows, 1 + dx:1 + dx + cols]) / distance
+        steeper = slope > steepest
+        steepest[steeper] = slope[steeper]
+        receivers[steeper] = index[steeper] + dy * cols + dx
+    return receivers.reshape(-1)
+
+
+def Stack(receivers):
+    """
+    The flat cells ordered receivers first (each cell after the cell it drains to), in linear time.
+    """
+    return Compiled().Stack(receivers)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Filling & Accumulation ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Fill(heightmap, epsilon = 0):
+    """
+    The heightmap (as float64) with its depressions filled & the flat cell indices from lowest to highest.
+    epsilon > 0 leaves a slope across filled depressions & flats so every cell drains off the map.
+    """
+    filled = np.array(heightmap, dtype = float)
+    order = Compiled().Fill(filled.reshape(-1), filled.shape[0], filled.shape[1], float(epsilon))
+    return filled, order
+
+
+def Accumulation(heightmap, weights = None, receivers = None, order = None):
+    """
+    Area draining through every cell (itself included), or the summed weights when given.
+    order is the flat cells with receivers first (see Fill & Stack), sorted from heightmap by default.
+    """
+    import kernels
+    receivers = Receivers(heightmap) if receivers is None else receivers
+    area = np.ones(heightmap.size) if weights is None else np.array(weights, dtype = float).reshape(-1)
+    if not kernels.available:
+        _accumulate(receivers, area)
+        return area.reshape(heightmap.shape)
+    order = np.argsort(heightmap, axis = None, kind = 'stable') if order is None else order
+    kernels.Accumulate(order[::-1], receivers, area)
+    return area.reshape(heightmap.shape)
+
+
+def _accumulate(receivers, area):
+    # Accumulation with array operations, a cell passes its area on once every cell draining into it has
+    cells = np.arange(receivers.size)
+    drains = receivers != cells
+    waiting = np.bincount(receivers[drains], minlength = receivers.size)
+    front = cells[drains & (waiting == 0)]
+    while front.size:
+        targets = receivers[front]
+        np.add.at(area, targets, area[front])
+        np.subtract.at(waiting, targets, 1)
+        targets = np.unique(targets)
+        front = targets[drains[targets] & (waiting[targets] == 0)]
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Stream Power ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Carve(filled, factor, m):
+    """
+    One implicit stream power step, F = factor * A^m / distance, on a filled float64 heightmap (in place).
+    """
+    kernels = Compiled()
+    receivers = Receivers(filled)
+    order = Stack(receivers)
+    area = Accumulation(filled, receivers = receivers, order = order)
+    kernels.Carve(filled.reshape(-1), order, receivers, area.reshape(-1), filled.shape[1], float(factor), float(m))
+    return filled
+
+
+def Erode(heightmap, positions, p, bounds = None, verbose = False, stats = None):
+    """
+    Carves heightmap (in place) for len(positions) of the run's drop_iterations, see the notes at the top.
+    bounds (r0, r1, c0, c1) limits the carving to that window, whose edges become the outlets.
+    stats is an optional instrument.Recorder.
+    """
+    r0, r1, c0, c1 = bounds or (0, heightmap.shape[0], 0, heightmap.shape[1])
+    terrain = heightmap[r0:r1, c0:c1]
+    share = len(positions) / max(p.drop_iterations, 1)
+    iterations = max(int(round(p.stream_iterations * share)), 1)
+    factor = p.stream_erodibility * share / iterations
+    before = terrain.astype(float)
+
+    timed = stats is not None
+    start = time.perf_counter()
+    # Routing over the filled surface, only the carving is applied to the map
+    filled, _ = Fill(terrain, p.stream_fill_epsilon)
+    carved = filled.copy()
+    for k in range(iterations):
+        Carve(carved, factor, p.stream_area_exponent)
+        if verbose:
+            print(k)
+    terrain += (carved - filled).astype(terrain.dtype)
+
+    if timed:
+        change = terrain - before
+        stats.add({'erode': time.perf_counter() - start}, None, iterations, -change[change < 0].sum(),
+            change[change > 0].sum())
+        stats.advance(len(positions))
+    return iterations
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
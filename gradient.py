@@ -0,0 +1,118 @@
+#
+# 10/18/26
+# ---------------------------------------- Incremental Gradient ----------------------------------------
+"""
+Keeps np.gradient of a heightmap up to date by only recomputing the cells around eroded or deposited points.
+"""
+# Touched windows are only recorded, update() merges all of them into one box per row band: the
+# windows are sorted into bands of _BAND rows and each band recomputes the columns its windows span.
+# A drop's path touches a thin trail of windows, so the bands cover little more than the trail
+# while costing a handful of array operations instead of one np.gradient per window. The gradient
+# is computed with the same central & one-sided differences as np.gradient, straight from slices
+# of the heightmap, and when the windows add up to the map or more it is recomputed whole.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import numpy as np
+
+# Rows per band of merged windows
+_BAND = 16
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Gradient Field ----------------------------------------
+
+class Gradient:
+    """
+    Wraps a heightmap and its (uy, ux) gradient. Call touch() for every changed cell and update() before reading.
+    The result always matches a full np.gradient(heightmap) exactly.
+    """
+
+    def __init__(self, heightmap):
+        self.heightmap = heightmap
+        self.uy, self.ux = np.gradient(heightmap)
+        self.dirty = set()
+
+    def touch(self, index, radius = 0):
+        """
+        Marks the square of cells within radius of index as changed. Negative indices wrap like numpy indexing.
+        """
+        rows, cols = self.heightmap.shape
+        self.dirty.add((index[0] % rows, index[1] % cols, radius))
+
+    def touch_many(self, rows_index, cols_index, radius = 0):
+        """
+        Vectorised touch() for arrays of row & column indices.
+        """
+        rows, cols = self.heightmap.shape
+        self.dirty.update(zip((rows_index % rows).tolist(), (cols_index % cols).tolist(), [radius] * len(rows_index)))
+
+    def update(self):
+        """
+        Recomputes the gradient around every touched cell since the last update.
+        """
+        if not self.dirty:
+            return self.uy, self.ux
+        rows, cols = self.heightmap.shape
+        if rows < 2 or cols < 2:
+            return self.refresh()
+
+        # Central differences reach one cell past the change
+        r, c, radius = np.array(list(self.dirty)).T
+        self.dirty.clear()
+        r0, r1 = np.maximum(r - radius - 1, 0), np.minimum(r + radius + 2, rows)
+        c0, c1 = np.maximum(c - radius - 1, 0), np.minimum(c + radius + 2, cols)
+        if ((r1 - r0) * (c1 - c0)).sum() >= rows * cols:
+            return self.refresh()
+
+        # One box per band of rows, from its windows' first to last row & column
+        order = np.argsort(r // _BAND, kind = 'stable')
+        band = r[order] // _BAND
+        starts = np.flatnonzero(np.concatenate(([True], band[1:] != band[:-1])))
+        boxes = zip(np.minimum.reduceat(r0[order], starts).tolist(), np.maximum.reduceat(r1[order], starts).tolist(),
+            np.minimum.reduceat(c0[order], starts).tolist(), np.maximum.reduceat(c1[order], starts).tolist())
+        for box in boxes:
+            _differences(self.heightmap, self.uy, self.ux, *box)
+        return self.uy, self.ux
+
+    def refresh(self):
+        """
+        Full recompute, for when the heightmap was changed without touch().
+        """
+        self.dirty.clear()
+        if min(self.heightmap.shape) < 2:
+            self.uy, self.ux = np.gradient(self.heightmap)
+        else:
+            _differences(self.heightmap, self.uy, self.ux, 0, self.heightmap.shape[0], 0, self.heightmap.shape[1])
+        return self.uy, self.ux
+
+
+def _differences(h, uy, ux, r0, r1, c0, c1):
+    # np.gradient of h over rows r0-r1 & columns c0-c1 into uy & ux: central differences inside the
+    # map, one-sided ones on its edges
+    rows, cols = h.shape
+    i0, i1 = max(r0, 1), min(r1, rows - 1)
+    if i0 < i1:
+        out = uy[i0:i1, c0:c1]
+        np.subtract(h[i0 + 1:i1 + 1, c0:c1], h[i0 - 1:i1 - 1, c0:c1], out = out)
+        np.divide(out, 2, out = out)
+    if r0 == 0:
+        np.subtract(h[1, c0:c1], h[0, c0:c1], out = uy[0, c0:c1])
+    if r1 == rows:
+        np.subtract(h[-1, c0:c1], h[-2, c0:c1], out = uy[-1, c0:c1])
+    j0, j1 = max(c0, 1), min(c1, cols - 1)
+    if j0 < j1:
+        out = ux[r0:r1, j0:j1]
+        np.subtract(h[r0:r1, j0 + 1:j1 + 1], h[r0:r1, j0 - 1:j1 - 1], out = out)
+        np.divide(out, 2, out = out)
+    if c0 == 0:
+        np.subtract(h[r0:r1, 1], h[r0:r1, 0], out = ux[r0:r1, 0])
+    if c1 == cols:
+        np.subtract(h[r0:r1, -1], h[r0:r1, -2], out = ux[r0:r1, -1])
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
@@ -0,0 +1,120 @@
+#
+# 10/18/26
+# ---------------------------------------- Instrumentation ----------------------------------------
+"""
+Phase timers, drop counters & progress callbacks for erosion runs, summarised as JSON.
+"""
+# Engines take an optional Recorder (stats = None keeps them uninstrumented). Drop loops keep
+# their timers & counters in locals and hand them over once per call, so a Recorder costs a few
+# perf_counter calls per step. The numba loop can't be split into phases, its time is 'drops'.
+#
+# Death reasons:
+#   out_of_bounds -- the next cell left the map (or the tile / bounds box)
+#   water_cutoff  -- the drop evaporated below water_cuttoff
+#   move_cap      -- the drop survived drop_move_cap steps
+#   stalled       -- the velocity vanished (or fell to drop_min_velocity) so the drop had nowhere to go
+#   pit           -- the drop was about to climb out of a pit (termination.py)
+#   oscillating   -- the drop was about to step back to where it was two steps before (termination.py)
+#   degenerate    -- the velocity wasn't finite
+#
+# saved_steps counts the steps left in the drop_move_cap budgets of drops ended by termination.py.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import json
+import time
+from contextlib import contextmanager
+
+PHASES = ('noise', 'gradient', 'movement', 'erode', 'deposit', 'drops', 'blur', 'render')
+DEATHS = ('out_of_bounds', 'water_cutoff', 'move_cap', 'stalled', 'pit', 'oscillating', 'degenerate')
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Recorder ----------------------------------------
+
+class Recorder:
+    """
+    Accumulates phase times & drop counters over any number of engine calls.
+    progress(drops, recorder) is called every `every` drops.
+    """
+
+    def __init__(self, progress = None, every = 500):
+        self.timers = dict.fromkeys(PHASES, 0.0)
+        self.deaths = dict.fromkeys(DEATHS, 0)
+        self.drops = 0
+        self.steps = 0
+        self.saved = 0
+        self.eroded = 0.0
+        self.deposited = 0.0
+        self.progress = progress
+        self.every = every
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] += time.perf_counter() - start
+
+    def add(self, timers = None, deaths = None, steps = 0, eroded = 0, deposited = 0, saved = 0):
+        """
+        Adds the totals of one engine call.
+        """
+        for name, seconds in (timers or {}).items():
+            self.timers[name] += seconds
+        for reason, n in (deaths or {}).items():
+            self.deaths[reason] += int(n)
+        self.steps += int(steps)
+        self.saved += int(saved)
+        self.eroded += float(eroded)
+        self.deposited += float(deposited)
+
+    def advance(self, drops):
+        """
+        Counts finished drops, calling progress each time another `every` drops are done.
+        """
+        before = self.drops
+        self.drops += drops
+        if self.progress:
+            for done in range(before + (-before) % self.every, self.drops, self.every):
+                self.progress(done, self)
+
+    def merge(self, summary):
+        """
+        Adds a summary() from another Recorder, e.g. one kept in a worker process.
+        """
+        self.add(summary['timers'], summary['deaths'], summary['steps'], summary['eroded'], summary['deposited'],
+            summary['saved_steps'])
+        self.advance(summary['drops'])
+
+    def summary(self):
+        return {
+            'timers': dict(self.timers),
+            'drops': self.drops,
+            'steps': self.steps,
+            'mean_path_length': self.steps / self.drops if self.drops else 0.0,
+            'saved_steps': self.saved,
+            'deaths': dict(self.deaths),
+            'eroded': self.eroded,
+            'deposited': self.deposited,
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent = 2)
+
+
+def Print(done, recorder):
+    """
+    Progress callback printing the drop count, like the old print every 500 drops.
+    """
+    print(done)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
@@ -0,0 +1,508 @@
+#
+# 10/18/26
+# ---------------------------------------- Compiled Kernels ----------------------------------------
+"""
+Numba-compiled droplet loop, used as the 'numba' backend in engine.py when numba is installed, the
+flow routing loops of flow.py (depression filling, accumulation & stream power) & PNG unfiltering for dem.py.
+"""
+# The kernel mirrors engine.Erode operation for operation (movement, capacity, erode/deposit,
+# brush, evaporation, the incremental gradient, bilinear sampling & drop termination) so both produce
+# identical heightmaps.
+# Without numba, available is False and engine.Backend falls back to the reference loop.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import math
+import time
+import numpy as np
+import brush
+import bilinear
+import termination
+import instrument
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+available = numba is not None
+
+
+def jit(function):
+    """
+    numba.njit when numba is installed, otherwise the plain Python function.
+    """
+    if numba is None:
+        return function
+    return numba.njit(cache = True)(function)
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Gradient, Sampling & Brush ----------------------------------------
+
+@jit
+def _gradient_box(heightmap, uy, ux, r0, r1, c0, c1):
+    # Same differences as np.gradient: central inside, one-sided on the map edges
+    rows, cols = heightmap.shape
+    for i in range(r0, r1):
+        for j in range(c0, c1):
+            if i == 0:
+                uy[i, j] = (heightmap[1, j] - heightmap[0, j]) / 1.0
+            elif i == rows - 1:
+                uy[i, j] = (heightmap[i, j] - heightmap[i - 1, j]) / 1.0
+            else:
+                uy[i, j] = (heightmap[i + 1, j] - heightmap[i - 1, j]) / 2.0
+            if j == 0:
+                ux[i, j] = (heightmap[i, 1] - heightmap[i, 0]) / 1.0
+            elif j == cols - 1:
+                ux[i, j] = (heightmap[i, j] - heightmap[i, j - 1]) / 1.0
+            else:
+                ux[i, j] = (heightmap[i, j + 1] - heightmap[i, j - 1]) / 2.0
+
+
+@jit
+def _flush(heightmap, uy, ux, touched, count):
+    rows, cols = heightmap.shape
+    for k in range(count):
+        r, c, radius = touched[k, 0], touched[k, 1], touched[k, 2]
+        _gradient_box(heightmap, uy, ux, max(r - radius - 1, 0), min(r + radius + 2, rows),
+            max(c - radius - 1, 0), min(c + radius + 2, cols))
+
+
+@jit
+def _corners(pos_y, pos_x, one):
+    # bilinear.Corners, np.floor keeps float32 positions in float32
+    fy, fx = np.floor(pos_y), np.floor(pos_x)
+    r, c = int(fy), int(fx)
+    fy, fx = pos_y - fy, pos_x - fx
+    gy, gx = one - fy, one - fx
+    return r, c, gy * gx, gy * fx, fy * gx, fy * fx
+
+
+@jit
+def _sample(field, r, c, w00, w01, w10, w11):
+    # bilinear.Sample
+    return field[r, c] * w00 + field[r, c + 1] * w01 + field[r + 1, c] * w10 + field[r + 1, c + 1] * w11
+
+
+@jit
+def _pit(heightmap, r, c):
+    # termination.Pit
+    rows, cols = heightmap.shape
+    for i in range(max(r - 1, 0), min(r + 2, rows)):
+        for j in range(max(c - 1, 0), min(c + 2, cols)):
+            if heightmap[i, j] < heightmap[r, c]:
+                return False
+    return True
+
+
+@jit
+def _brush(ermap, r0, c0, amount, R, weights, table):
+    # Radius weighted erosion, clipped like brush.Erode
+    rows, cols = ermap.shape
+    a0, a1 = max(r0 - R, 0), min(r0 + R + 1, rows)
+    b0, b1 = max(c0 - R, 0), min(c0 + R + 1, cols)
+    kr0, kr1 = a0 - r0 + R, a1 - r0 + R
+    kc0, kc1 = b0 - c0 + R, b1 - c0 + R
+    total = table[kr1, kc1] - table[kr0, kc1] - table[kr1, kc0] + table[kr0, kc0]
+    for i in range(a0, a1):
+        for j in range(b0, b1):
+            ermap[i, j] -= amount * weights[i - r0 + R, j - c0 + R] / total
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Droplet Loop ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+@jit
+def _erode(ermap, uy, ux, positions, p_move_cap, p_drop_size, p_evaporation, vel_y, vel_x, p_grav, k_momentum,
+        k_inertia, k_water_cuttoff, k_erosion_rate, k_capacity, k_deposition_rate, k_erode_radius,
+        k_min_slope_capacity, weights, table, b_r0, b_r1, b_c0, b_c1, counts, sampled, one, terminate, k_min_velocity,
+        k_oscillation):
+    R = k_erode_radius
+    zero = p_drop_size - p_drop_size # 0 in the heightmap dtype, int literals would promote float32 to float64
+    cy = cx = ty = tx = 0
+    w00 = w01 = w10 = w11 = wt00 = wt01 = wt10 = wt11 = zero
+    prev_y = prev_x = zero
+    touched = np.zeros((p_move_cap, 3), dtype = np.int64)
+    count = 0
+    steps = 0
+
+    # Initializing drop
+    for d in range(positions.shape[0]):
+        _flush(ermap, uy, ux, touched, count)
+        count = 0
+        pos_y, pos_x = positions[d, 0], positions[d, 1]
+        vy, vx = vel_y, vel_x
+        speed = math.sqrt(vy * vy + vx * vx)
+        water_cap = p_drop_size
+        sed_carry = zero
+        if sampled:
+            cy, cx, w00, w01, w10, w11 = _corners(pos_y, pos_x, one)
+
+        # Drop sequence, counts holds the instrument.DEATHS tallies (0-6) then eroded & deposited mass & saved steps
+        died = False
+        for t in range(p_move_cap):
+            r0, c0 = int(np.rint(pos_y)), int(np.rint(pos_x))
+
+            # Calculating movement
+            if sampled:
+                grad_y = _sample(uy, cy, cx, w00, w01, w10, w11)
+                grad_x = _sample(ux, cy, cx, w00, w01, w10, w11)
+            else:
+                grad_y, grad_x = uy[r0, c0], ux[r0, c0]
+            vy = vy * k_momentum - grad_y * k_inertia
+            vx = vx * k_momentum - grad_x * k_inertia
+            norm_vel = math.sqrt(vy * vy + vx * vx)
+            if not (norm_vel > k_min_velocity and norm_vel < math.inf):
+                if norm_vel <= k_min_velocity:
+                    counts[3] += 1
+                else:
+                    counts[6] += 1
+                if terminate:
+                    counts[9] += p_move_cap - t
+                    counts[8] += sed_carry
+                    _brush(ermap, r0, c0, -sed_carry, R, weights, table)
+                    touched[count, 0], touched[count, 1], touched[count, 2] = r0, c0, R
+                    count += 1
+                died = True
+                break
+
+            # Moving drop
+            last_y, last_x = pos_y, pos_x
+            pos_y = pos_y + vy / norm_vel
+            pos_x = pos_x + vx / norm_vel
+            if sampled:
+                ty, tx, wt00, wt01, wt10, wt11 = _corners(pos_y, pos_x, one)
+                rt, ct = ty, tx
+            else:
+                rt, ct = int(np.rint(pos_y)), int(np.rint(pos_x))
+
+            # Checking if drop exists
+            if not (rt >= b_r0 and rt < b_r1 and ct >= b_c0 and ct < b_c1 and water_cap > k_water_cuttoff):
+                if water_cap > k_water_cuttoff:
+                    counts[0] += 1
+                else:
+                    counts[1] += 1
+                died = True
+                break
+
+            # Determining erosion
+            if sampled:
+                del_h = _sample(ermap, ty, tx, wt00, wt01, wt10, wt11) - _sample(ermap, cy, cx, w00, w01, w10, w11)
+            else:
+                del_h = ermap[rt, ct] - ermap[r0, c0]
+
+            # Ending stuck drops before they take the step
+            if terminate:
+                reason = -1
+                if del_h > 0 and _pit(ermap, r0, c0):
+                    reason = 4
+                elif t > 0 and (pos_y - prev_y) * (pos_y - prev_y) + (pos_x - prev_x) * (pos_x - prev_x) < k_oscillation:
+                    reason = 5
+                if reason >= 0:
+                    counts[reason] += 1
+                    counts[9] += p_move_cap - t
+                    counts[8] += sed_carry
+                    _brush(ermap, r0, c0, -sed_carry, R, weights, table)
+                    touched[count, 0], touched[count, 1], touched[count, 2] = r0, c0, R
+                    count += 1
+                    died = True
+                    break
+                prev_y, prev_x = last_y, last_x
+            steps += 1
+            carry_cap = max(k_min_slope_capacity, -del_h) * speed * water_cap * k_capacity
+
+            # Depositing sediment
+            if sed_carry > carry_cap:
+                deposit = (sed_carry - carry_cap) * k_deposition_rate
+                sed_carry -= deposit
+                if sampled:
+                    ermap[cy, cx] += deposit * w00
+                    ermap[cy, cx + 1] += deposit * w01
+                    ermap[cy + 1, cx] += deposit * w10
+                    ermap[cy + 1, cx + 1] += deposit * w11
+                    touched[count, 0], touched[count, 1], touched[count, 2] = cy, cx, 1
+                else:
+                    ermap[r0, c0] += deposit
+                    touched[count, 0], touched[count, 1], touched[count, 2] = r0, c0, 0
+                counts[8] += deposit
+                count += 1
+                speed = zero
+
+            # Eroding sediment
+            else:
+                erode = min((carry_cap - sed_carry) * k_erosion_rate, -del_h)
+                sed_carry += erode
+                counts[7] += erode
+                speed = math.sqrt(abs(speed * speed - del_h * p_grav))
+                touched[count, 0], touched[count, 1], touched[count, 2] = r0, c0, R
+                count += 1
+                _brush(ermap, r0, c0, erode, R, weights, table)
+
+            # Evaporating water
+            water_cap -= p_evaporation
+            if sampled:
+                cy, cx, w00, w01, w10, w11 = ty, tx, wt00, wt01, wt10, wt11
+        if not died:
+            counts[2] += 1
+
+    _flush(ermap, uy, ux, touched, count)
+    return steps
+
+
+def Erode(heightmap, positions, p, bounds = None, verbose = False, stats = None, field = None):
+    """
+    Same interface & results as engine.Erode, compiled with numba. The kernel leaves field's gradient up to date.
+    """
+    # Scalars are passed in the heightmap dtype so float32 maps are stepped in float32
+    real = heightmap.dtype.type
+    kernel = brush.Kernel(p.erosion_radius, heightmap.dtype)
+    uy, ux = np.gradient(heightmap) if field is None else field.update()
+    positions = np.ascontiguousarray(positions, dtype = heightmap.dtype)
+    vel = [real(v) for v in p.rain_initial_vel]
+    sampled = bilinear.Enabled(p)
+    if sampled:
+        bounds = bilinear.Bounds(bounds, heightmap.shape)
+    else:
+        bounds = bounds or (0, heightmap.shape[0], 0, heightmap.shape[1])
+    terminate, min_velocity, oscillation = termination.Thresholds(p)
+    counts = np.zeros(len(instrument.DEATHS) + 3)
+    steps = 0
+
+    # Chunks of 500 drops to keep the progress count
+    for start in range(0, len(positions), 500):
+        t0 = time.perf_counter()
+        steps += _erode(heightmap, uy, ux, positions[start:start + 500], p.drop_move_cap, real(p.drop_initial_water),
+            real(p.drop_initial_water / p.drop_move_cap), vel[0], vel[1], real(p.world_gravity), real(p.drop_momentum),
+            real(1 - p.drop_momentum), real(p.water_cuttoff),
+            real(p.erosion_rate), real(p.sediment_capacity_multiplier), real(p.deposition_rate),
+            int(p.erosion_radius), real(p.min_slope_capacity), kernel.weights, kernel.table, *bounds, counts, sampled, real(1),
+            terminate, real(min_velocity), real(oscillation * oscillation))
+        if verbose:
+            print(start)
+        if stats is not None:
+            stats.add({'drops': time.perf_counter() - t0})
+            stats.advance(min(500, len(positions) - start))
+
+    if stats is not None:
+        deaths = len(instrument.DEATHS)
+        stats.add(None, dict(zip(instrument.DEATHS, counts[:deaths])), steps, *counts[deaths:])
+    return steps
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Flow Routing ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+@jit
+def _push(keys, cells, size, key, cell):
+    # Binary min-heap of (key, cell) in two arrays, returns the new size
+    k = size
+    while k > 0:
+        parent = (k - 1) // 2
+        if keys[parent] <= key:
+            break
+        keys[k], cells[k] = keys[parent], cells[parent]
+        k = parent
+    keys[k], cells[k] = key, cell
+    return size + 1
+
+
+@jit
+def _pop(keys, cells, size):
+    # Removes the smallest key, returns (cell, new size)
+    top = cells[0]
+    size -= 1
+    key, cell = keys[size], cells[size]
+    k = 0
+    while True:
+        child = 2 * k + 1
+        if child >= size:
+            break
+        if child + 1 < size and keys[child + 1] < keys[child]:
+            child += 1
+        if key <= keys[child]:
+            break
+        keys[k], cells[k] = keys[child], cells[child]
+        k = child
+    keys[k], cells[k] = key, cell
+    return top, size
+
+
+@jit
+def Fill(filled, rows, cols, epsilon):
+    """
+    Priority-flood from the map edges over the flat map filled (in place), raising every cell to at least epsilon
+    above the neighbour it was reached from. Returns the cells in the order they were flooded. See flow.Fill.
+    """
+    n = rows * cols
+    keys = np.empty(n)
+    cells = np.empty(n, np.int64)
+    order = np.empty(n, np.int64)
+    closed = np.zeros(n, np.bool_)
+    size = 0
+    for cell in range(n):
+        r, c = cell // cols, cell % cols
+        if r == 0 or c == 0 or r == rows - 1 or c == cols - 1:
+            closed[cell] = True
+            size = _push(keys, cells, size, filled[cell], cell)
+    done = 0
+    while size > 0:
+        cell, size = _pop(keys, cells, size)
+        order[done] = cell
+        done += 1
+        r, c = cell // cols, cell % cols
+        for dy in range(-1, 2):
+            for dx in range(-1, 2):
+                nr, nc = r + dy, c + dx
+                if nr < 0 or nc < 0 or nr >= rows or nc >= cols:
+                    continue
+                near = nr * cols + nc
+                if closed[near]:
+                    continue
+                closed[near] = True
+                filled[near] = max(filled[near], filled[cell] + epsilon)
+                size = _push(keys, cells, size, filled[near], near)
+    return order
+
+
+@jit
+def Receivers(heightmap, receivers, neighbours, distances):
+    """
+    Flat index of the steepest lower neighbour of every cell (itself if none) into the flat receivers. See flow.Receivers.
+    """
+    rows, cols = heightmap.shape
+    for i in range(rows):
+        for j in range(cols):
+            height = np.float64(heightmap[i, j])
+            steepest = 0.0
+            receiver = i * cols + j
+            for k in range(len(distances)):
+                ni, nj = i + neighbours[k, 0], j + neighbours[k, 1]
+                if ni < 0 or nj < 0 or ni >= rows or nj >= cols:
+                    continue
+                slope = (height - np.float64(heightmap[ni, nj])) / distances[k]
+                if slope > steepest:
+                    steepest = slope
+                    receiver = ni * cols + nj
+            receivers[i * cols + j] = receiver
+
+
+@jit
+def Stack(receivers):
+    """
+    Cells ordered receivers first, depth first from every outlet (Braun & Willett 2013), in linear time.
+    """
+    n = len(receivers)
+    starts = np.zeros(n + 1, np.int64)
+    for cell in range(n):
+        if receivers[cell] != cell:
+            starts[receivers[cell] + 1] += 1
+    for cell in range(n):
+        starts[cell + 1] += starts[cell]
+    donors = np.empty(starts[n], np.int64)
+    filled = starts[:n].copy()
+    for cell in range(n):
+        receiver = receivers[cell]
+        if receiver != cell:
+            donors[filled[receiver]] = cell
+            filled[receiver] += 1
+
+    order = np.empty(n, np.int64)
+    pending = np.empty(n, np.int64)
+    done = 0
+    for outlet in range(n):
+        if receivers[outlet] != outlet:
+            continue
+        pending[0] = outlet
+        top = 1
+        while top > 0:
+            top -= 1
+            cell = pending[top]
+            order[done] = cell
+            done += 1
+            for k in range(starts[cell], starts[cell + 1]):
+                pending[top] = donors[k]
+                top += 1
+    return order
+
+
+@jit
+def Accumulate(order, receivers, area):
+    """
+    Adds each cell's area to its receiver's, visiting cells in order (highest first). See flow.Accumulation.
+    """
+    for cell in order:
+        receiver = receivers[cell]
+        if receiver != cell:
+            area[receiver] += area[cell]
+
+
+@jit
+def Carve(heightmap, order, receivers, area, cols, factor, m):
+    """
+    One implicit stream power step over the flat heightmap, visiting cells in order (receivers first). See flow.Carve.
+    """
+    for cell in order:
+        receiver = receivers[cell]
+        if receiver != cell:
+            step = abs(cell - receiver)
+            distance = 1.0 if step == 1 or step == cols else math.sqrt(2.0)
+            f = factor * area[cell] ** m / distance
+            heightmap[cell] = (heightmap[cell] + f * heightmap[receiver]) / (1 + f)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Image Decoding ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+@jit
+def Unfilter(data, previous, bpp):
+    """
+    Undoes the PNG filters of n scanlines (n, 1 + stride) after the unfiltered previous one, bpp bytes per pixel. See dem.py.
+    """
+    n, stride = data.shape[0], data.shape[1] - 1
+    out = np.empty((n, stride), np.uint8)
+    for i in range(n):
+        kind = data[i, 0]
+        prior = previous if i == 0 else out[i - 1]
+        for j in range(stride):
+            x = np.int32(data[i, j + 1])
+            a = np.int32(out[i, j - bpp]) if j >= bpp else np.int32(0)
+            b = np.int32(prior[j])
+            c = np.int32(prior[j - bpp]) if j >= bpp else np.int32(0)
+            if kind == 1:
+                x += a
+            elif kind == 2:
+                x += b
+            elif kind == 3:
+                x += (a + b) // 2
+            elif kind == 4:
+                guess = a + b - c
+                pa, pb, pc = abs(guess - a), abs(guess - b), abs(guess - c)
+                if pa <= pb and pa <= pc:
+                    x += a
+                elif pb <= pc:
+                    x += b
+                else:
+                    x += c
+            out[i, j] = x & 255
+    return out
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
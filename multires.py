@@ -0,0 +1,104 @@
+#
+# 10/18/26
+# ---------------------------------------- Multi-Resolution Erosion ----------------------------------------
+"""
+Coarse-to-fine erosion over a pyramid of the heightmap, for multires_levels > 1.
+"""
+# Level 0 is the map downsampled by 2 ** (multires_levels - 1), every level after it twice as fine,
+# the last the map itself. Each level is eroded in turn by the erosion_engine:
+#   1. the current map (the base plus what the coarser levels did) is blurred & downsampled, with
+#      heights divided by the factor so slopes per cell stay the same at every level
+#   2. the level is eroded with drops, drop_move_cap & erosion_radius scaled by the factor, so the
+#      drops cover the map as densely as at full resolution & travel as far
+#   3. the change is upsampled bilinearly & added back to the full map as it is. A coarse drop
+#      carries as much sediment as a fine one but over factor ** 3 times the volume per unit of
+#      height, and stands for factor ** 2 fine drops, so its change isn't scaled back up by the
+#      factor. This keeps the eroded volume & channel depth close to a single level run
+# The drop density of a full resolution run is split over the levels, each finer level getting
+# multires_refine times the share of the level above, so the coarse levels carve the valleys cheaply
+# and the full resolution level only adds the detail. The full resolution level draws the drops a
+# single level run would (streams.py), so multires_levels = 1 is the same run as without it.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import numpy as np
+from scipy import ndimage
+import engine
+import spawn
+import settings
+import parameters as param
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Pyramid ----------------------------------------
+
+def Levels(p):
+    """
+    (factor, parameters) of every level from the coarsest to the map itself.
+    """
+    levels = []
+    shares = p.multires_refine ** np.arange(p.multires_levels)
+    shares /= shares.sum()
+    for level in range(p.multires_levels):
+        factor = 2 ** (p.multires_levels - 1 - level)
+        levels.append((factor, settings.Namespace(p,
+            drop_iterations = int(round(p.drop_iterations * shares[level] / factor ** 2)),
+            drop_move_cap = max(p.drop_move_cap // factor, 1),
+            erosion_radius = max(int(round(p.erosion_radius / factor)), 1) if p.erosion_radius else 0)))
+    return levels
+
+
+def Downsample(heightmap, factor):
+    """
+    heightmap blurred & sampled every factor cells, in float64.
+    """
+    return ndimage.gaussian_filter(np.asarray(heightmap, dtype = float), factor / 2)[::factor, ::factor]
+
+
+def Upsample(level, factor, shape):
+    """
+    A Downsample()d level interpolated back to shape, bilinearly & one axis at a time.
+    """
+    for axis, size in enumerate(shape):
+        position = np.arange(size) / factor
+        low = np.minimum(position.astype(np.intp), level.shape[axis] - 1)
+        high = np.minimum(low + 1, level.shape[axis] - 1)
+        weight = np.expand_dims(position - low, 1 - axis)
+        level = np.take(level, low, axis) * (1 - weight) + np.take(level, high, axis) * weight
+    return level
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Erosion ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Erode(heightmap, p = param, verbose = False, stats = None):
+    """
+    Erodes heightmap (in place) level by level, returning the total steps. stats is an optional instrument.Recorder.
+    """
+    steps = 0
+    for factor, q in Levels(p):
+        if verbose:
+            print('level 1/%d, %d drops' % (factor, q.drop_iterations))
+        if factor == 1:
+            level = heightmap
+        else:
+            level = (Downsample(heightmap, factor) / factor).astype(heightmap.dtype)
+            before = level.astype(float)
+        # The full resolution level rains like a single level run, coarser ones on rain streams of their own
+        drops = spawn.Spawner(q, level, key = () if factor == 1 else (factor,)).draw(q.drop_iterations)
+        steps += engine.Erosion(q)(level, drops, q, verbose = verbose, stats = stats)
+        if factor > 1:
+            heightmap += Upsample(level - before, factor, heightmap.shape).astype(heightmap.dtype)
+    return steps
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
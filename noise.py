@@ -15,6 +15,15 @@ Generating perlin and fractal noise.
 # 4/13:
 # Vectorized all components, runs abou ~25x faster than before
 #
+# 10/18/26:
+# Added OctaveMemmap, writes fractal noise to a memmap in row strips under a memory ceiling
+# Perlin works from per-row/per-column node indices & offsets instead of full-size nodal matrices,
+# same output with a fraction of the memory
+# Octave reuses its buffers, sums in place & can generate octaves on a thread pool
+# Everything can be generated in float32 with the dtype argument
+# Gradient angles come from a stream per octave (streams.py) instead of one RandomState(seed) shared
+# by every octave, so octaves are independent of each other & of any thread or process
+#
 # ----------------------------------------------------------------------------------------------------
 # ----------------------------------------------------------------------------------------------------
 
@@ -22,154 +31,111 @@ Generating perlin and fractal noise.
 # ---------------------------------------- Imports ----------------------------------------
 
 import math
+import resource
+import threading
 import numpy as np
-from itertools import product
+import streams
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 
 
 # ----------------------------------------------------------------------------------------------------
 # ---------------------------------------- Perlin Noise ----------------------------------------
 
-def Perlin(grid, resolution, seed = 1, burn = .5):
+def Perlin(grid, resolution, seed = 1, burn = .5, dtype = float, octave = 0):
     """
     Takes argument for grid node scale and overall resolution. Resolution has to be evenly divisible by grid.
+    Everything is computed in dtype (float32 halves the memory). octave picks the random stream, see Octave.
     """
+    # Generating random gradients
+    angs = _angles(grid, seed, octave, dtype)
+
+    # Final noise & normalization
+    noise_norm = _perlin_rows(grid, resolution, angs, 0, resolution + 1, burn)
+    _normalize(noise_norm)
+    return noise_norm
+
+
+def _angles(grid, seed, octave, dtype = float):
+    # Gradient angles from the octave's own stream, never the global RNG
+    return (2 * math.pi * streams.Generator(seed, streams.NOISE, octave).random((grid + 1, grid + 1))).astype(dtype)
+
+
+def _normalize(noise_raw):
+    # 255 * (noise_raw - min) / (max - min), in place
+    low, high = np.amin(noise_raw), np.amax(noise_raw)
+    noise_raw -= low
+    noise_raw *= 255
+    noise_raw /= high - low
+    return noise_raw
+
+
+def _perlin_rows(grid, resolution, angs, r0, r1, burn = .5, buffers = None):
+    """
+    Rows r0:r1 of the Perlin noise for the node angles angs, before normalization, in the dtype of angs.
+    buffers can hold three (r1 - r0, resolution + 1) arrays to reuse, the first one is returned.
+    """
+    # Everything is worked out per row or per column of pixels and only broadcast to full size
+    # when the four corners are summed, so only three full-size arrays exist at once.
+
     # ---------------------------------------- Initializing variables ----------------------------------------
-    # Bookeeping variables
-    np.random.seed(seed)
-    grid_size = (grid, grid)
-    resolution = (resolution, resolution) 
-    delta = resolution[0] // grid_size[0]
-
-    # Cordinate grids
-    nodes = (grid_size[0] + 1, grid_size[1] + 1)
-    samples = (resolution[0] + 1, resolution[1] + 1)
-    x_int = [i for i in range(nodes[0])]
-    y_int = [i for i in range(nodes[1] - 1, -1, -1)]
-    x = np.linspace(0, grid_size[0], samples[0])
-    y = np.linspace(grid_size[1], 0, samples[1])
+    n = resolution
+    delta = n // grid
+    dtype = angs.dtype
+    i = np.arange(r0, r1)
+    j = np.arange(n + 1)
+    x = np.linspace(0, grid, n + 1, dtype = dtype)
+    y = np.linspace(grid, 0, n + 1, dtype = dtype)[r0:r1]
     # Want y = 0 at bottom of grid
-    xx, yy = np.meshgrid(x, y)
-    XX, YY = np.meshgrid(x_int, y_int)
 
-    # Generating random gradients
-    angs = 2 * math.pi * np.random.rand(nodes[0], nodes[1])
-
-
-    # ---------------------------------------- Nodal Matricies ----------------------------------------
-    # Calculates which grid node a pixel belongs to
-
-    # Nodal matrix - X
-    x_tl = XX[:-1, :-1].repeat(delta, 0).repeat(delta, 1)
-    row = x_tl[resolution[0] - 1]
-    x_tl = np.insert(x_tl, resolution[0], row, axis = 0)
-    col = x_tl[:, resolution[1] - 1]
-    x_tl = np.insert(x_tl, resolution[1], col, axis = 1)
-
-    x_tr = XX[:-1, 1:].repeat(delta, 0).repeat(delta, 1)
-    row = x_tr[resolution[0] - 1]
-    x_tr = np.insert(x_tr, resolution[0], row, axis = 0)
-    col = x_tr[:, 0]
-    x_tr = np.insert(x_tr, 0, col, axis = 1)
-
-    x_bl = XX[1:, :-1].repeat(delta, 0).repeat(delta, 1)
-    row = x_bl[0]
-    x_bl = np.insert(x_bl, 0, row, axis = 0)
-    col = x_bl[:, resolution[1] - 1]
-    x_bl = np.insert(x_bl, resolution[1], col, axis = 1)
-
-    x_br = XX[1:, 1:].repeat(delta, 0).repeat(delta, 1)
-    row = x_br[0]
-    x_br = np.insert(x_br, 0, row, axis = 0)
-    col = x_br[:, 0]
-    x_br = np.insert(x_br, 0, col, axis = 1)
-
-
-    # Nodal matrix - Y
-    y_tl = YY[:-1, :-1].repeat(delta, 0).repeat(delta, 1)
-    row = y_tl[resolution[0] - 1]
-    y_tl = np.insert(y_tl, resolution[0], row, axis = 0)
-    col = y_tl[:, resolution[1] - 1]
-    y_tl = np.insert(y_tl, resolution[1], col, axis = 1)
-
-    y_tr = YY[:-1, 1:].repeat(delta, 0).repeat(delta, 1)
-    row = y_tr[resolution[0] - 1]
-    y_tr = np.insert(y_tr, resolution[0], row, axis = 0)
-    col = y_tr[:, 0]
-    y_tr = np.insert(y_tr, 0, col, axis = 1)
-
-    y_bl = YY[1:, :-1].repeat(delta, 0).repeat(delta, 1)
-    row = y_bl[0]
-    y_bl = np.insert(y_bl, 0, row, axis = 0)
-    col = y_bl[:, resolution[1] - 1]
-    y_bl = np.insert(y_bl, resolution[1], col, axis = 1)
-
-    y_br = YY[1:, 1:].repeat(delta, 0).repeat(delta, 1)
-    row = y_br[0]
-    y_br = np.insert(y_br, 0, row, axis = 0)
-    col = y_br[:, 0]
-    y_br = np.insert(y_br, 0, col, axis = 1)
-
-
-    # ---------------------------------------- Gradient Matricies ----------------------------------------
-    grad_tl = angs[:-1, :-1].repeat(delta, 0).repeat(delta, 1)
-    row = grad_tl[resolution[0] - 1]
-    grad_tl = np.insert(grad_tl, resolution[0], row, axis = 0)
-    col = grad_tl[:, resolution[1] - 1]
-    grad_tl = np.insert(grad_tl, resolution[1], col, axis = 1)
-
-    grad_tr = angs[:-1, 1:].repeat(delta, 0).repeat(delta, 1)
-    row = grad_tr[resolution[0] - 1]
-    grad_tr = np.insert(grad_tr, resolution[0], row, axis = 0)
-    col = grad_tr[:, 0]
-    grad_tr = np.insert(grad_tr, 0, col, axis = 1)
-
-    grad_bl = angs[1:, :-1].repeat(delta, 0).repeat(delta, 1)
-    row = grad_bl[0]
-    grad_bl = np.insert(grad_bl, 0, row, axis = 0)
-    col = grad_bl[:, resolution[1] - 1]
-    grad_bl = np.insert(grad_bl, resolution[1], col, axis = 1)
-
-    grad_br = angs[1:, 1:].repeat(delta, 0).repeat(delta, 1)
-    row = grad_br[0]
-    grad_br = np.insert(grad_br, 0, row, axis = 0)
-    col = grad_br[:, 0]
-    grad_br = np.insert(grad_br, 0, col, axis = 1)
-
-
-    # ---------------------------------------- Calculating distance ----------------------------------------
-    d_tlx, d_tly = (xx - x_tl), (yy - y_tl)
-    d_trx, d_try = (xx - x_tr), (yy - y_tr)
-    d_blx, d_bly = (xx - x_bl), (yy - y_bl)
-    d_brx, d_bry = (xx - x_br), (yy - y_br)
-
-    # ---------------------------------------- Calculating dot product ----------------------------------------
-    dot_tl = d_tlx * np.cos(grad_tl) + d_tly * np.sin(grad_tl)
-    dot_tr = d_trx * np.cos(grad_tr) + d_try * np.sin(grad_tr)
-    dot_bl = d_blx * np.cos(grad_bl) + d_bly * np.sin(grad_bl)
-    dot_br = d_brx * np.cos(grad_br) + d_bry * np.sin(grad_br)
-
-    # ---------------------------------------- Interpolation & Normalization ----------------------------------------
+    # ---------------------------------------- Cell indices & offsets ----------------------------------------
+    # Grid node above/below each row & left/right of each column. Rows & columns on a node
+    # line use the node on both sides, like the border row/column of the old nodal matrices.
+    top, bot = np.minimum(i, n - 1) // delta, np.maximum(i - 1, 0) // delta + 1
+    left, right = np.minimum(j, n - 1) // delta, np.maximum(j - 1, 0) // delta + 1
+    d_top, d_bot = y - (grid - top).astype(dtype), y - (grid - bot).astype(dtype)
+    d_left, d_right = x - left.astype(dtype), x - right.astype(dtype)
+
+    # ---------------------------------------- Interpolation ----------------------------------------
     def interpolate(t):
         f = 6*t**5 - 15*t**4 + 10*t**3
         return f
 
-    ones = np.ones((samples[0], samples[1]))
-
-    influence_tl = interpolate(ones - abs(d_tlx)) * interpolate(ones - abs(d_tly))
-    influence_tr = interpolate(ones - abs(d_trx)) * interpolate(ones - abs(d_try))
-    influence_bl = interpolate(ones - abs(d_blx)) * interpolate(ones - abs(d_bly))
-    influence_br = interpolate(ones - abs(d_brx)) * interpolate(ones - abs(d_bry))
-
-    # Final noise & normalization
-    noise_raw = influence_tl * dot_tl + influence_tr * dot_tr + influence_bl * dot_bl + influence_br * dot_br
-    burn_mat = np.ones((samples[0], samples[1]))
-    indicies = [[np.array([*product(range(0, samples[0], delta), range(0, samples[1], delta))])]]
-    burn_mat[indicies,:] = burn
-    burn_mat[:, indicies] = burn
-    noise_raw *= burn_mat
-    noise_norm = 255 * (noise_raw - np.amin(noise_raw)) / (np.amax(noise_raw) - np.amin(noise_raw))
-    return noise_norm
+    fade_top, fade_bot = interpolate(1 - abs(d_top)), interpolate(1 - abs(d_bot))
+    fade_left, fade_right = interpolate(1 - abs(d_left)), interpolate(1 - abs(d_right))
+
+    # ---------------------------------------- Gradient vectors ----------------------------------------
+    grad_x, grad_y = np.cos(angs), np.sin(angs)
+
+    # ---------------------------------------- Summing corners ----------------------------------------
+    shape = (r1 - r0, n + 1)
+    noise_raw, dot, work = buffers or (np.empty(shape, dtype), np.empty(shape, dtype), np.empty(shape, dtype))
+    noise_raw.fill(0)
+    corners = [
+        (top, left, d_top, d_left, fade_top, fade_left),
+        (top, right, d_top, d_right, fade_top, fade_right),
+        (bot, left, d_bot, d_left, fade_bot, fade_left),
+        (bot, right, d_bot, d_right, fade_bot, fade_right),
+    ]
+    for rows, cols, d_y, d_x, fade_y, fade_x in corners:
+        # Dot product of distance & gradient
+        np.take(grad_x[:, cols], rows, axis = 0, out = work)
+        np.multiply(d_x, work, out = dot)
+        np.take(grad_y[:, cols], rows, axis = 0, out = work)
+        np.multiply(d_y[:, None], work, out = work)
+        dot += work
+
+        # Weighting by influence
+        np.multiply(fade_x, fade_y[:, None], out = work)
+        work *= dot
+        noise_raw += work
+
+    # Burning node lines
+    row_nodes, col_nodes = i % delta == 0, j % delta == 0
+    noise_raw[:, col_nodes] *= burn
+    noise_raw[np.ix_(row_nodes, ~col_nodes)] *= burn
+    return noise_raw
 
 # ----------------------------------------------------------------------------------------------------
 # ----------------------------------------------------------------------------------------------------
@@ -179,18 +145,120 @@ def Perlin(grid, resolution, seed = 1, burn = .5):
 
 # ---------------------------------------- Fractal Noise ----------------------------------------
 # ----------------------------------------------------------------------------------------------------
-def Octave(resolution, octaves = 3, lacunarity = 2, persistance = 0.5, seed = 1):
+def Octave(resolution, octaves = 3, lacunarity = 2, persistance = 0.5, seed = 1, threads = 1, dtype = float):
     """
     Lacunarity equates to first octave node scale. Resolution should be divisible by every lancunarity^octave permutation.
+    With threads > 1 octaves are generated concurrently, the result is identical to threads = 1.
     """
-    zraw = np.zeros((resolution + 1, resolution + 1))
-    for i in range(octaves):
+    samples = (resolution + 1, resolution + 1)
+    zraw = np.zeros(samples, dtype)
+
+    def octave(i, buffers):
+        # Normalized & weighted octave i, left in buffers[0]
         freq = lacunarity ** i
         weight = persistance ** i
-        oct = Perlin(freq, resolution, seed)
-        zraw += weight * oct
-    znorm = 255 * (zraw - np.amin(zraw)) / (np.amax(zraw) - np.amin(zraw))
-    return znorm
+        oct = _normalize(_perlin_rows(freq, resolution, _angles(freq, seed, i, dtype), 0, resolution + 1, buffers = buffers))
+        oct *= weight
+        return oct
+
+    # Sequential: one set of buffers for every octave
+    if threads <= 1:
+        buffers = (np.empty(samples, dtype), np.empty(samples, dtype), np.empty(samples, dtype))
+        for i in range(octaves):
+            zraw += octave(i, buffers)
+
+    # Threaded: buffers per thread, octaves summed in order as they finish
+    else:
+        local = threading.local()
+
+        def task(i):
+            if not hasattr(local, 'buffers'):
+                local.buffers = (np.empty(samples, dtype), np.empty(samples, dtype))
+            return octave(i, (np.empty(samples, dtype),) + local.buffers)
+
+        with ThreadPoolExecutor(threads) as pool:
+            pending = deque()
+            for i in range(octaves):
+                pending.append(pool.submit(task, i))
+                if len(pending) >= threads:
+                    zraw += pending.popleft().result()
+            while pending:
+                zraw += pending.popleft().result()
+
+    return _normalize(zraw)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Out-of-core Fractal Noise ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+# Rough number of temporaries per sample while evaluating a strip
+_STRIP_TEMPORARIES = 8
+
+
+def _peak_rss():
+    # High-water mark of this process in bytes, VmHWM on Linux & ru_maxrss elsewhere
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _reset_peak_rss():
+    # Linux lets a process reset its own VmHWM, elsewhere the peak covers the whole process
+    try:
+        with open('/proc/self/clear_refs', 'w') as refs:
+            refs.write('5')
+    except OSError:
+        pass
+
+
+def OctaveMemmap(filename, resolution, octaves = 3, lacunarity = 2, persistance = 0.5, seed = 1, max_memory = 256 * 2 ** 20, dtype = float):
+    """
+    Same values as Octave, written to an np.memmap at filename in row strips so only max_memory bytes of temporaries exist at once.
+    Returns the memmap and the peak RSS in bytes measured while generating.
+    """
+    _reset_peak_rss()
+    samples = resolution + 1
+    strip = max(1, min(samples, max_memory // (_STRIP_TEMPORARIES * np.dtype(dtype).itemsize * samples)))
+    strips = [(r0, min(r0 + strip, samples)) for r0 in range(0, samples, strip)]
+    grids = [lacunarity ** i for i in range(octaves)]
+    angles = [_angles(grid, seed, i, dtype) for i, grid in enumerate(grids)]
+
+    # Pass 1: every octave is normalized by its own min & max before being summed
+    stats = []
+    for grid, angs in zip(grids, angles):
+        low, high = np.inf, -np.inf
+        for r0, r1 in strips:
+            noise_raw = _perlin_rows(grid, resolution, angs, r0, r1)
+            low, high = min(low, np.amin(noise_raw)), max(high, np.amax(noise_raw))
+        stats.append((low, high))
+
+    # Pass 2: summing the octaves strip by strip
+    znorm = np.memmap(filename, dtype = dtype, mode = 'w+', shape = (samples, samples))
+    low, high = np.inf, -np.inf
+    for r0, r1 in strips:
+        zraw = np.zeros((r1 - r0, samples), dtype)
+        for i, (grid, angs) in enumerate(zip(grids, angles)):
+            weight = persistance ** i
+            noise_raw = _perlin_rows(grid, resolution, angs, r0, r1)
+            oct = 255 * (noise_raw - stats[i][0]) / (stats[i][1] - stats[i][0])
+            zraw += weight * oct
+        znorm[r0:r1] = zraw
+        low, high = min(low, np.amin(zraw)), max(high, np.amax(zraw))
+
+    # Pass 3: final normalization in place
+    for r0, r1 in strips:
+        znorm[r0:r1] = 255 * (znorm[r0:r1] - low) / (high - low)
+    znorm.flush()
+    return znorm, _peak_rss()
 
 # ----------------------------------------------------------------------------------------------------
 # ----------------------------------------------------------------------------------------------------
@@ -16,6 +16,14 @@ noise_octaves = 4
 noise_lacunarity = 2
 noise_persistance = .8
 map_seed = 5
+noise_threads = 1
+    # Octaves generated at the same time on a thread pool, the map is the same for any value.
+map_dtype = 'float64'
+    # 'float32' halves the memory of the noise, heightmap & gradients.
+terrain_cache_dir = ''
+    # Directory to cache generated base terrains in (cache.py), '' regenerates every run.
+terrain_cache_budget = 4 * 2 ** 30
+    # Bytes the cache may use before the least recently used terrains are deleted.
 
 # Rain parameters
 drop_iterations = 25000
@@ -23,11 +31,36 @@ drop_move_cap = 250
 drop_initial_water = 1
 rain_seed = 874923
 rain_initial_vel = [0, 0]
+rain_distribution = 'uniform'
+    # 'uniform', 'slope', 'flow', 'density' or 'stratified' drop starts (spawn.py).
+rain_density_path = ''
+    # .npy map of non-negative rain weights for rain_distribution = 'density'.
+rain_uniform_mix = .1
+    # Share of the weighted distributions spread uniformly, so flats still get rain.
+drop_batch_size = 1
+    # Drops simulated together in lockstep, 1 keeps strict one-drop-at-a-time behaviour.
+drop_backend = 'reference'
+    # 'reference' or 'numba' for the one-drop-at-a-time loop. Both give identical maps.
+multires_levels = 1
+    # Pyramid levels eroded coarse to fine (multires.py), 1 erodes the map once at full resolution.
+multires_refine = .25
+    # Share of the drops each finer level gets relative to the level above.
+erosion_engine = 'droplet'
+    # 'droplet' follows drops (engine.py), 'pipe' simulates water over the whole grid (pipe.py),
+    # 'stream' carves drainage networks with the stream power law (flow.py).
 
 # Movement parameters
 world_gravity = 20
 drop_momentum = .2
 water_cuttoff = .001
+drop_termination = False
+    # Ends drops that stall, climb out of a pit or oscillate early, settling their sediment (termination.py).
+drop_min_velocity = .01
+    # With drop_termination, drops this slow or slower have stalled.
+drop_oscillation_distance = .5
+    # With drop_termination, drops ending a step this close to where they were two steps before oscillate.
+drop_sampling = 'nearest'
+    # 'bilinear' interpolates heights & gradients between cells and splits deposits over the 4 nearest cells.
 
 # Erosion parameters
 erosion_rate = .9
@@ -36,8 +69,62 @@ deposition_rate =  .02
 erosion_radius = 4
 min_slope_capacity = .01
 
+# Pipe model parameters, for erosion_engine = 'pipe'
+pipe_drops_per_step = 100
+    # Drops rained per timestep.
+pipe_time_step = .05
+pipe_capacity = 1
+pipe_erosion_rate = .5
+pipe_deposition_rate = 1
+pipe_evaporation = .5
+    # Share of the water evaporating per unit of time.
+
+# Stream power parameters, for erosion_engine = 'stream'
+stream_iterations = 5
+    # Implicit steps over the whole drop_iterations run.
+stream_erodibility = .2
+stream_area_exponent = .5
+stream_fill_epsilon = 1e-4
+    # Slope left across filled depressions & flats so they drain.
+
 # Render parameters
 map_colormap = 'YlGn'
 map_z_scale = 5
 map_board_scale = 10
-processing_blur = 1
\ No newline at end of file
+processing_blur = 1
+render_headless = False
+    # True skips the mayavi plot (mayavi is never imported), for batch runs without a display.
+export_path = ''
+    # Base path to export the eroded map to (export.py), '' skips exporting.
+export_formats = ['npy', 'png', 'raw']
+    # Any of 'npy', 'png' (16-bit greyscale) & 'raw' (little-endian float32), with a .json sidecar.
+
+# Tiled erosion parameters
+tile_processes = 0
+    # Worker processes for tiled erosion (tiled.py), 0 runs everything in this process.
+tile_size = 128
+tile_halo = 0
+    # Halo width around each tile, at least erosion_radius + 1 (0 picks that minimum).
+tile_rounds = 4
+    # Each tile's drops are split over this many checkerboard sweeps of the map.
+
+# Instrumentation parameters
+instrument = False
+    # Phase timers, drop counters & progress through instrument.py, off costs nothing.
+instrument_path = ''
+    # JSON file for the run summary, '' prints it instead.
+
+# Sweep parameters
+sweep_processes = 0
+    # Worker processes for parameter sweeps (sweep.py), 0 uses every core.
+
+# Checkpoint parameters
+checkpoint_path = ''
+    # File to checkpoint long runs to (checkpoint.py), '' disables checkpoints.
+checkpoint_every_drops = 0
+checkpoint_every_seconds = 0
+    # Checkpoint every N drops and/or T seconds, 0 turns either off.
+
+# Import parameters
+dem_window = 1024
+    # Core side length of the windows large imported heightmaps are eroded in (dem.py).
@@ -0,0 +1,212 @@
+#
+# 10/18/26
+# ---------------------------------------- Pipe Model Erosion ----------------------------------------
+"""
+Grid-based erosion with the shallow-water pipe model, the erosion_engine = 'pipe' alternative to drops.
+"""
+# Instead of following drops the whole map carries water height d, outflow flux to the 4 neighbours
+# (fL, fR, fT, fB), velocity (u, v) and suspended sediment s, and every timestep updates all cells
+# with array operations (after Mei, Decaudin & Hu 2007, "Fast Hydraulic Erosion Simulation and
+# Visualization on GPU"):
+#   rain        -- the drops of this timestep each add drop_initial_water to their nearest cell
+#   flux        -- pipes between neighbours gain flux with the difference in water surface b + d,
+#                  scaled down where a cell would lose more water than it holds
+#   water       -- d changes by inflow - outflow, the average flow through a cell gives (u, v)
+#   erosion     -- capacity C = pipe_capacity * sin(tilt) * |(u, v)|, the terrain is dissolved into
+#                  s at pipe_erosion_rate below capacity & settles out at pipe_deposition_rate above it
+#   transport   -- s moves with the water, each pipe carrying the share of a cell's water it drained
+#   evaporation -- d shrinks by pipe_evaporation per unit time
+# Water flows off the map edges as if the ground outside were level with the edge & dry, taking its
+# sediment with it. Moving sediment along the pipes (rather than tracing it back along (u, v)) keeps
+# the sediment that stays on the map exactly conserved.
+#
+# The engine takes the same arguments as the drop engines (engine.py): positions are where rain
+# falls, pipe_drops_per_step of them per timestep, and the return value is the number of timesteps.
+# Each call starts dry and ends by settling any suspended sediment where it is, so like the batched
+# engine a run split into several calls isn't identical to a single call. With stats the timesteps
+# are timed as movement (rain, flux & water), erode and deposit (transport & evaporation).
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import time
+import numpy as np
+
+# Mean water depth below which a cell is dry & its water doesn't move sediment
+_DRY = 1e-4
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- State ----------------------------------------
+
+class Grid:
+    """
+    Water, flux, velocity & sediment of a rows x cols map, in dtype.
+    """
+
+    def __init__(self, shape, dtype):
+        self.water = np.zeros(shape, dtype)
+        self.sediment = np.zeros(shape, dtype)
+        self.flux = np.zeros((4,) + shape, dtype) # left, right, top, bottom
+        self.vel_y = np.zeros(shape, dtype)
+        self.vel_x = np.zeros(shape, dtype)
+        self.surface = np.zeros((shape[0] + 2, shape[1] + 2), dtype)
+        self.share = np.zeros((4,) + shape, dtype)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Timestep ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def _flux(terrain, grid, dt, p):
+    # Pipe flux from the water surface differences, scaled so no cell loses more water than it has
+    surface = grid.surface
+    surface[1:-1, 1:-1] = terrain + grid.water
+    surface[0, 1:-1], surface[-1, 1:-1] = terrain[0], terrain[-1]
+    surface[1:-1, 0], surface[1:-1, -1] = terrain[:, 0], terrain[:, -1]
+    level = surface[1:-1, 1:-1]
+    gain = dt * p.world_gravity
+    for f, neighbour in zip(grid.flux, (surface[1:-1, :-2], surface[1:-1, 2:], surface[:-2, 1:-1], surface[2:, 1:-1])):
+        f += gain * (level - neighbour)
+        np.maximum(f, 0, out = f)
+    outflow = grid.flux.sum(axis = 0)
+    scale = np.minimum(1, grid.water / np.maximum(outflow * dt, np.finfo(outflow.dtype).tiny))
+    grid.flux *= scale
+    return outflow * scale
+
+
+def _water(grid, outflow, dt):
+    # Water update & velocity from the flow through every cell, over the mean depth of the step
+    left, right, top, bottom = grid.flux
+    inflow = _inflow(grid.flux)
+    np.divide(grid.flux * dt, grid.water, out = grid.share, where = grid.water > 0)
+    grid.share[:, grid.water <= 0] = 0
+    depth = grid.water.copy()
+    grid.water += dt * (inflow - outflow)
+    np.maximum(grid.water, 0, out = grid.water)
+    depth += grid.water
+    depth *= .5
+
+    through_x = right - left
+    through_x[:, 1:] += right[:, :-1]
+    through_x[:, :-1] -= left[:, 1:]
+    through_y = bottom - top
+    through_y[1:] += bottom[:-1]
+    through_y[:-1] -= top[1:]
+    wet = depth > _DRY
+    grid.vel_x[:] = 0
+    grid.vel_y[:] = 0
+    np.divide(through_x, 2 * depth, out = grid.vel_x, where = wet)
+    np.divide(through_y, 2 * depth, out = grid.vel_y, where = wet)
+
+
+def _erode(terrain, grid, dt, p):
+    # Dissolves terrain below capacity & settles sediment above it, returns (eroded, deposited)
+    grad_y, grad_x = np.gradient(terrain)
+    slope = grad_y * grad_y + grad_x * grad_x
+    tilt = np.maximum(np.sqrt(slope / (1 + slope)), p.min_slope_capacity)
+    speed = np.sqrt(grid.vel_y * grid.vel_y + grid.vel_x * grid.vel_x)
+    excess = p.pipe_capacity * tilt * speed - grid.sediment
+    change = np.where(excess > 0, p.pipe_erosion_rate * dt * excess, p.pipe_deposition_rate * dt * excess)
+    np.minimum(change, grid.water, out = change, where = change > 0) # can't dissolve more than the water holds
+    np.maximum(change, -grid.sediment, out = change)
+    terrain -= change
+    grid.sediment += change
+    return change[change > 0].sum(), -change[change < 0].sum()
+
+
+def _transport(grid):
+    # Moves suspended sediment along the pipes with the share of water each drained
+    moved = grid.share * grid.sediment
+    grid.sediment -= moved.sum(axis = 0)
+    grid.sediment += _inflow(moved)
+
+
+def _inflow(out):
+    # What every cell receives from its neighbours' (left, right, top, bottom) outflows
+    left, right, top, bottom = out
+    inflow = np.zeros_like(left)
+    inflow[:, 1:] += right[:, :-1]
+    inflow[:, :-1] += left[:, 1:]
+    inflow[1:] += bottom[:-1]
+    inflow[:-1] += top[1:]
+    return inflow
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Engine ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Erode(heightmap, positions, p, bounds = None, verbose = False, stats = None):
+    """
+    Rains positions on heightmap (eroded in place) pipe_drops_per_step at a time, one timestep each.
+    bounds (r0, r1, c0, c1) limits the simulation to that window, rain outside it is ignored.
+    stats is an optional instrument.Recorder.
+    """
+    r0, r1, c0, c1 = bounds or (0, heightmap.shape[0], 0, heightmap.shape[1])
+    terrain = heightmap[r0:r1, c0:c1]
+    shape, dtype = terrain.shape, heightmap.dtype
+    grid = Grid(shape, dtype)
+    dt = dtype.type(p.pipe_time_step)
+    evaporation = dtype.type(max(1 - p.pipe_evaporation * p.pipe_time_step, 0))
+
+    # Rain cells, drops outside the window fall elsewhere
+    cells = np.rint(np.asarray(positions, dtype = float).reshape(-1, 2)).astype(np.intp) - (r0, c0)
+    inside = (cells >= 0).all(axis = 1) & (cells < shape).all(axis = 1)
+    cells = np.where(inside, cells[:, 0] * shape[1] + cells[:, 1], -1)
+    per_step = max(int(p.pipe_drops_per_step), 1)
+    timesteps = -(-len(cells) // per_step)
+
+    # Instrumentation
+    timed = stats is not None
+    clock = time.perf_counter
+    t_movement = t_erode = t_deposit = 0.0
+    eroded = deposited = 0.0
+
+    for k in range(timesteps):
+        if timed:
+            t0 = clock()
+        rain = cells[k * per_step:(k + 1) * per_step]
+        rain = rain[rain >= 0]
+        grid.water.reshape(-1)[:] += p.drop_initial_water * np.bincount(rain, minlength = terrain.size)
+        outflow = _flux(terrain, grid, dt, p)
+        _water(grid, outflow, dt)
+        if timed:
+            t1 = clock()
+            t_movement += t1 - t0
+        step_eroded, step_deposited = _erode(terrain, grid, dt, p)
+        eroded += step_eroded
+        deposited += step_deposited
+        if timed:
+            t2 = clock()
+            t_erode += t2 - t1
+        _transport(grid)
+        grid.water *= evaporation
+        if timed:
+            t_deposit += clock() - t2
+            stats.advance(min(per_step, len(cells) - k * per_step))
+
+        # Counting progress
+        if verbose and k % 50 == 0:
+            print(k * per_step)
+
+    # Settling what the water still carries
+    terrain += grid.sediment
+    deposited += grid.sediment.sum()
+
+    if timed:
+        stats.add({'movement': t_movement, 'erode': t_erode, 'deposit': t_deposit}, None, timesteps, eroded, deposited)
+    return timesteps
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
@@ -0,0 +1,32 @@
+#
+# 10/18/26
+# ---------------------------------------- Rendering ----------------------------------------
+"""
+Mayavi surface plot of a heightmap. mayavi is only imported when Show is called, so headless runs never load VTK/Qt.
+"""
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import parameters as param
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Plotting ----------------------------------------
+
+def Show(heightmap, p = param):
+    """
+    Plots heightmap as a mayavi surface with the render parameters & blocks until the window is closed.
+    """
+    from mayavi import mlab
+
+    # Mayavi surface (GEN 0)
+    e = mlab.surf(heightmap, colormap = p.map_colormap, extent = [0, p.map_board_scale, 0, p.map_board_scale, 0, p.map_z_scale])
+    e.module_manager.scalar_lut_manager.reverse_lut = True
+    mlab.show()
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
@@ -0,0 +1,36 @@
+#
+# 10/18/26
+# ---------------------------------------- Parameter Sets ----------------------------------------
+"""
+Parameter sets: parameters.py (or any other set) copied into a plain namespace with overrides.
+"""
+# Modules take a parameter set p that is either the parameters module itself or a namespace made
+# here. A namespace pickles, so it can be sent to worker processes (tiled.py, sweep.py), saved as
+# JSON (checkpoint.py, export.py) and changed per job without touching the module.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import types
+import parameters as param
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Namespaces ----------------------------------------
+
+def Namespace(p = None, **overrides):
+    """
+    Copies the parameters of p (parameters.py by default) into a plain, picklable namespace with any overrides applied.
+    """
+    values = vars(param if p is None else p)
+    values = {k: v for k, v in values.items()
+        if not k.startswith('_') and not callable(v) and not isinstance(v, types.ModuleType)}
+    values.update(overrides)
+    return types.SimpleNamespace(**values)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
@@ -0,0 +1,130 @@
+#
+# 10/18/26
+# ---------------------------------------- Rain Spawning ----------------------------------------
+"""
+Where drops start, for rain_distribution = 'uniform', 'slope', 'flow', 'density' or 'stratified'.
+"""
+# 'uniform' draws (rows - 1, cols - 1) * uniform(n, 2) from the rain stream (streams.py). The weighted distributions spend more of the drop budget where drops do work:
+#   slope      -- gradient magnitude, steep ground erodes & flats barely do
+#   flow       -- D8 flow accumulation (flow.py), the cells channels form along
+#   density    -- a non-negative map loaded from rain_density_path (.npy), resampled to the map
+# rain_uniform_mix of every weighted distribution is uniform, so flats & basins still get some rain.
+# A weighted drop picks a cell from the cumulative weights (a binary search of a uniform draw) and
+# is jittered over the cell with two more draws. Drop i always gets the same draws of the rain
+# stream, so splitting a run into any chunks gives the same drops.
+#
+# 'stratified' covers the map evenly instead of randomly, with the R2 low-discrepancy sequence
+# shifted by a rain_seed offset. Drop i of a run is always point i of the sequence.
+#
+# The weights come from the map when the Spawner is made, before any drops fell, and stay fixed
+# for the whole run (checkpoints store them, see checkpoint.py).
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import numpy as np
+import flow
+import streams
+
+# Plastic number, R2 steps by its inverse & inverse square along the two axes
+_PLASTIC = 1.32471795724474602596
+_R2 = np.array([1 / _PLASTIC, 1 / _PLASTIC ** 2])
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Weights ----------------------------------------
+
+def Slope(heightmap, p):
+    """
+    Gradient magnitude of every cell.
+    """
+    grad_y, grad_x = np.gradient(np.asarray(heightmap, dtype = float))
+    return np.sqrt(grad_y * grad_y + grad_x * grad_x)
+
+
+def Flow(heightmap, p):
+    """
+    Cells draining through every cell, see flow.Accumulation.
+    """
+    return flow.Accumulation(heightmap)
+
+
+def Density(heightmap, p):
+    """
+    The rain_density_path map, resampled to the heightmap by nearest cell.
+    """
+    density = np.load(p.rain_density_path)
+    if density.ndim != 2:
+        raise ValueError('rain density map %r has shape %s, expected 2 dimensions' % (p.rain_density_path, density.shape))
+    if (density < 0).any():
+        raise ValueError('rain density map %r has negative values' % p.rain_density_path)
+    rows, cols = heightmap.shape
+    return density[(np.arange(rows) * density.shape[0]) // rows][:, (np.arange(cols) * density.shape[1]) // cols]
+
+
+# rain_distribution names of the weighted distributions, each a function of (heightmap, p)
+WEIGHTS = {'slope': Slope, 'flow': Flow, 'density': Density}
+DISTRIBUTIONS = ('uniform', 'stratified') + tuple(WEIGHTS)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Spawner ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+class Spawner:
+    """
+    Draws drop positions on a heightmap for p.rain_distribution from the rain_seed streams. weights skips computing
+    them, e.g. when resuming, key is extra spawn key entries for rain separate from the run's (streams.py).
+    """
+
+    def __init__(self, p, heightmap, weights = None, key = ()):
+        if p.rain_distribution not in DISTRIBUTIONS:
+            raise ValueError('unknown rain_distribution %r, expected one of %s' % (p.rain_distribution,
+                ', '.join(DISTRIBUTIONS)))
+        self.distribution = p.rain_distribution
+        self.shape = heightmap.shape
+        self.seed, self.key = p.rain_seed, tuple(key)
+        self.rain = {} # streams.Rain cache, for drawing a few drops at a time
+        self.weights = None
+        if self.distribution in WEIGHTS:
+            if weights is None:
+                weights = WEIGHTS[self.distribution](heightmap, p)
+            self.weights = np.asarray(weights, dtype = float)
+            total = self.weights.sum()
+            if not np.isfinite(total) or total <= 0:
+                raise ValueError('rain_distribution %r has no positive weights on this map' % self.distribution)
+            mixed = (1 - p.rain_uniform_mix) * self.weights.reshape(-1) / total + p.rain_uniform_mix / self.weights.size
+            self.cdf = np.cumsum(mixed)
+            self.cdf /= self.cdf[-1]
+        elif self.distribution == 'stratified':
+            self.shift = streams.Generator(self.seed, streams.SHIFT, *self.key).random(2)
+
+    def draw(self, n, start = 0):
+        """
+        Positions of the n drops from drop start on.
+        """
+        rows, cols = self.shape
+        if self.distribution == 'uniform':
+            return np.multiply((rows - 1, cols - 1), streams.Rain(self.seed, start, n, 2, self.key, self.rain))
+        if self.distribution == 'stratified':
+            points = np.arange(start, start + n, dtype = float)[:, None] * _R2 + self.shift
+            return np.multiply((rows - 1, cols - 1), points % 1)
+
+        # Weighted, a cell from the cdf & a jitter over it, kept inside the map like uniform drops
+        draws = streams.Rain(self.seed, start, n, 3, self.key, self.rain)
+        cells = np.minimum(np.searchsorted(self.cdf, draws[:, 0], side = 'right'), self.cdf.size - 1)
+        drops = np.empty((n, 2))
+        drops[:, 0] = cells // cols + draws[:, 1] - .5
+        drops[:, 1] = cells % cols + draws[:, 2] - .5
+        np.clip(drops, 0, np.nextafter((rows - 1, cols - 1), 0), out = drops)
+        return drops
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
@@ -0,0 +1,67 @@
+#
+# 10/18/26
+# ---------------------------------------- Random Streams ----------------------------------------
+"""
+Independent, reproducible random streams for noise & rain, never touching the global NumPy RNG.
+"""
+# Every stream is an np.random.Generator seeded from SeedSequence(seed, spawn_key = key), where the
+# key names what the numbers are for:
+#   (NOISE, octave)       -- gradient angles of one noise octave
+#   (RAIN, *key, block)   -- uniform draws for drops block * RAIN_BLOCK onward
+#   (SHIFT, *key)         -- the offset of stratified rain
+# A stream only depends on the seed & its key, never on what was drawn before it or on which thread
+# or process draws it. Octaves can be generated in any order on any number of threads, and any run
+# of drops can be drawn on its own: a checkpointed run needs no RNG state, workers can draw their own
+# drops, and splitting a run into chunks, tiles or lockstep batches never changes which drop gets
+# which numbers. key is extra spawn key entries for separate rain of the same seed, e.g. one per
+# multires.py level.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import numpy as np
+
+# Stream names, the first entry of every spawn key
+NOISE, RAIN, SHIFT = 0, 1, 2
+
+# Drops per rain block
+RAIN_BLOCK = 4096
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Streams ----------------------------------------
+
+def Generator(seed, *key):
+    """
+    The stream of seed named by key.
+    """
+    return np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key = key)))
+
+
+def Rain(seed, start, n, width = 2, key = (), cache = None):
+    """
+    Uniform [0, 1) draws of shape (n, width) for drops start to start + n, the same however a run is split.
+    cache is a dict kept between calls that holds the last block drawn, so drawing a block's drops a few at a time
+    draws the block once.
+    """
+    out = np.empty((n, width))
+    first, last = start // RAIN_BLOCK, -(-(start + n) // RAIN_BLOCK)
+    for block in range(first, last):
+        b0 = block * RAIN_BLOCK
+        name = (seed, tuple(key), block, width)
+        if cache is not None and cache.get('name') == name:
+            draws = cache['draws']
+        else:
+            draws = Generator(seed, RAIN, *key, block).random((RAIN_BLOCK, width))
+            if cache is not None:
+                cache['name'], cache['draws'] = name, draws
+        lo, hi = max(start, b0), min(start + n, b0 + RAIN_BLOCK)
+        out[lo - start:hi - start] = draws[lo - b0:hi - b0]
+    return out
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
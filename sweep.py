@@ -0,0 +1,145 @@
+#
+# 10/18/26
+# ---------------------------------------- Parameter Sweeps ----------------------------------------
+"""
+Running many erosion parameter sets over one base terrain on a process pool.
+Run with: python sweep.py sets.json results   (sets.json is a list of overrides or a dict of value lists)
+"""
+# The base terrain is generated once and put in shared memory, workers map it read-only and copy it
+# into a buffer they keep between jobs, so a job costs one memcpy on top of its erosion. Eroded maps
+# go straight into one shared results.npy (job, row, col) memmap and the metrics of every job into
+# results.json, in the order of the sets.
+#
+# Jobs run with tile_processes = 0, the pool already uses every core.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import sys
+import json
+import time
+import itertools
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import engine
+import erosion
+import instrument
+import spawn
+import settings
+import parameters as param
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Parameter Sets ----------------------------------------
+
+def Grid(**axes):
+    """
+    Every combination of the given value lists, e.g. Grid(erosion_rate = [.5, .9], erosion_radius = [2, 4]).
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Workers ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+_worker = {}
+
+
+def _attach(name, shape, dtype, output):
+    # Pool initializer, maps the base terrain read-only & the results memmap once per process
+    shm = shared_memory.SharedMemory(name = name)
+    base = np.ndarray(shape, dtype = dtype, buffer = shm.buf)
+    base.setflags(write = False)
+    _worker['shm'] = shm
+    _worker['base'] = base
+    _worker['map'] = np.empty(shape, dtype)
+    _worker['output'] = np.load(output, mmap_mode = 'r+') if output else None
+
+
+def _run_job(task):
+    # Erodes one parameter set, returning its metrics
+    job, p = task
+    base, ermap = _worker['base'], _worker['map']
+    start = time.perf_counter()
+    np.copyto(ermap, base)
+    drops = spawn.Spawner(p, base).draw(p.drop_iterations)
+    stats = instrument.Recorder()
+    engine.Erosion(p)(ermap, drops, p, stats = stats)
+    if _worker['output'] is not None:
+        _worker['output'][job] = ermap
+
+    change = ermap - base
+    summary = stats.summary()
+    summary.pop('timers')
+    summary.update({
+        'seconds': time.perf_counter() - start,
+        'mean_change': float(np.abs(change).mean()),
+        'max_erosion': float(-change.min()),
+        'max_deposition': float(change.max()),
+    })
+    return job, summary
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Sweeps ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Run(sets, p = param, output = None, processes = None, base = None, verbose = False):
+    """
+    Erodes the base terrain (erosion.Terrain(p) by default) once per override dict in sets, returning a list of
+    {'parameters', 'metrics'}. With output the eroded maps go to output.npy & the list to output.json.
+    """
+    p = settings.Namespace(p, tile_processes = 0)
+    processes = processes or p.sweep_processes or mp.cpu_count()
+    base = erosion.Terrain(p) if base is None else base
+    base = np.asarray(base, dtype = p.map_dtype)
+    jobs = [(i, settings.Namespace(p, **overrides)) for i, overrides in enumerate(sets)]
+
+    # results.npy, allocated here & filled by the workers
+    if output:
+        np.lib.format.open_memmap(output + '.npy', mode = 'w+', dtype = base.dtype, shape = (len(jobs),) + base.shape)
+
+    results = [None] * len(jobs)
+    shm = shared_memory.SharedMemory(create = True, size = base.nbytes)
+    try:
+        shared = np.ndarray(base.shape, dtype = base.dtype, buffer = shm.buf)
+        shared[:] = base
+        del shared
+        initargs = (shm.name, base.shape, base.dtype, output and output + '.npy')
+        with mp.Pool(processes, _attach, initargs) as pool:
+            for done, (job, metrics) in enumerate(pool.imap_unordered(_run_job, jobs), 1):
+                results[job] = {'parameters': sets[job], 'metrics': metrics}
+                if verbose:
+                    print('%d of %d' % (done, len(jobs)))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    if output:
+        with open(output + '.json', 'w') as f:
+            json.dump(results, f, indent = 2)
+    return results
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+if __name__ == '__main__':
+    with open(sys.argv[1]) as f:
+        sets = json.load(f)
+    if isinstance(sets, dict):
+        sets = Grid(**sets)
+    Run(sets, output = sys.argv[2], verbose = True)
@@ -0,0 +1,92 @@
+#
+# 10/18/26
+# ---------------------------------------- Drop Termination ----------------------------------------
+"""
+Ending drops that can no longer do useful work, for drop_termination = True.
+"""
+# Without a policy a drop runs until it leaves the map, evaporates or hits drop_move_cap, even when
+# it is stuck. With drop_termination on the engines end a drop the step it is
+#   stalled     -- its velocity is at most drop_min_velocity (always checked with 0, so a drop
+#                  that stopped dead never divides by a zero norm)
+#   degenerate  -- its velocity isn't finite, e.g. from NaN heights (always checked)
+#   pit         -- about to move uphill out of a cell with no lower neighbour
+#   oscillating -- about to end up within drop_oscillation_distance of where it was two steps ago
+# A drop that ends this way doesn't take the step. Its sediment is spread around its cell with the
+# erosion brush (brush.py), so the pit or flat it stopped in fills up instead of the sediment being
+# lost. The steps left in its drop_move_cap budget are counted as saved (instrument.py).
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import numpy as np
+import brush
+
+# Neighbour offsets checked for pits
+NEIGHBOURS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Detection ----------------------------------------
+
+def Thresholds(p):
+    """
+    (enabled, min_velocity, oscillation_distance) for p, thresholds of 0 when the policy is off.
+    """
+    if not p.drop_termination:
+        return False, 0, 0
+    return True, p.drop_min_velocity, p.drop_oscillation_distance
+
+
+def Pit(heightmap, r, c):
+    """
+    True when no neighbour of cell (r, c) inside the map is lower than it.
+    """
+    return heightmap[max(r - 1, 0):r + 2, max(c - 1, 0):c + 2].min() >= heightmap[r, c]
+
+
+def PitsMany(flat_map, rows_index, cols_index, shape, out, height, value, near):
+    """
+    Pit() for arrays of cells of a flattened map, written into the bool array out.
+    height & value are scratch arrays of the map dtype, near a pair of intp ones. Neighbours past the edge are
+    clipped onto the cell itself, which is never lower.
+    """
+    rows, cols = shape
+    near_r, near_c = near
+    np.add(np.multiply(rows_index, cols, out = near_r), cols_index, out = near_r)
+    np.take(flat_map, near_r, out = height)
+    out[:] = True
+    for dy, dx in NEIGHBOURS:
+        np.minimum(np.maximum(np.add(rows_index, dy, out = near_r), 0, out = near_r), rows - 1, out = near_r)
+        np.minimum(np.maximum(np.add(cols_index, dx, out = near_c), 0, out = near_c), cols - 1, out = near_c)
+        np.add(np.multiply(near_r, cols, out = near_r), near_c, out = near_r)
+        np.logical_and(out, np.greater_equal(np.take(flat_map, near_r, out = value), height), out = out)
+    return out
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Settling ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def Settle(heightmap, index, sediment, radius):
+    """
+    Spreads a terminated drop's sediment around index with the erosion brush.
+    """
+    brush.Erode(heightmap, index, -sediment, radius)
+
+
+def SettleMany(heightmap, rows_index, cols_index, sediment, radius, scratch = None, amount = None):
+    """
+    Settle() for arrays of drops, drops with 0 sediment leave the map unchanged.
+    amount is an optional array for the negated sediment, it may be sediment itself.
+    """
+    brush.ErodeMany(heightmap, rows_index, cols_index, np.negative(sediment, out = amount), radius, scratch)
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
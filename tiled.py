@@ -0,0 +1,150 @@
+#
+# 10/18/26
+# ---------------------------------------- Tiled Erosion ----------------------------------------
+"""
+Multi-process erosion: the heightmap lives in shared memory and is split into tiles eroded in parallel.
+"""
+# Tiles & phases:
+#   The map is cut into tile_size x tile_size cores. A worker erodes one tile through a window of
+#   the core plus a halo at least erosion_radius + 1 wide, so the brush & gradient never need cells
+#   past the window. Tiles are coloured like a 2x2 checkerboard and only one colour runs at a time,
+#   which leaves a full tile between any two concurrent cores. As long as tile_size >= 2 * halo
+#   no two workers ever write (or read) the same cell.
+#
+# Drop policy:
+#   Drops start in the tile whose core holds their start position. A drop is terminated the moment
+#   its next cell leaves that core, exactly like a drop running off the map edge: it stops eroding
+#   and the sediment it carries is dropped from the simulation. Drops are not handed to neighbours.
+#
+# The drops are split over tile_rounds sweeps of all four colours so erosion builds up evenly across
+# the map instead of one colour at a time. Round k shifts the tile grid by k * tile_size / tile_rounds
+# cells along both axes (& recolours it), so drops end on different seams every round and the grid
+# doesn't show in the eroded map.
+#
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+# ---------------------------------------- Imports ----------------------------------------
+
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import engine
+import instrument
+import settings
+import parameters as param
+
+
+
+# ----------------------------------------------------------------------------------------------------
+# ---------------------------------------- Tiling ----------------------------------------
+
+def Tiles(shape, tile_size, halo, offset = 0):
+    """
+    Lists (core, window, colour) for every tile, cores & windows as (r0, r1, c0, c1) boxes. offset shifts the grid up
+    & left by that many cells, the first row & column of tiles are cut short by it.
+    """
+    if tile_size < 2 * halo:
+        raise ValueError('tile_size %d is too small for a halo of %d, needs at least %d' % (tile_size, halo, 2 * halo))
+    rows, cols = shape
+    tiles = []
+    for ti, top in enumerate(range(-offset, rows, tile_size)):
+        for tj, left in enumerate(range(-offset, cols, tile_size)):
+            r0, r1 = max(top, 0), min(top + tile_size, rows)
+            c0, c1 = max(left, 0), min(left + tile_size, cols)
+            core = (r0, r1, c0, c1)
+            window = (max(r0 - halo, 0), min(r1 + halo, rows), max(c0 - halo, 0), min(c1 + halo, cols))
+            tiles.append((core, window, 2 * (ti % 2) + tj % 2))
+    return tiles
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Workers ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+_worker = {}
+
+
+def _attach(name, shape, dtype, p, instrumented):
+    # Pool initializer, maps the shared heightmap once per process
+    shm = shared_memory.SharedMemory(name = name)
+    _worker['shm'] = shm
+    _worker['map'] = np.ndarray(shape, dtype = dtype, buffer = shm.buf)
+    _worker['p'] = p
+    _worker['instrumented'] = instrumented
+
+
+def _erode_tile(task):
+    # (steps, instrument summary or None) for one tile
+    core, window, positions = task
+    p = _worker['p']
+    r0, r1, c0, c1 = window
+    view = _worker['map'][r0:r1, c0:c1]
+    local = positions - (r0, c0)
+    bounds = (core[0] - r0, core[1] - r0, core[2] - c0, core[3] - c0)
+    stats = instrument.Recorder() if _worker['instrumented'] else None
+    if p.drop_batch_size > 1:
+        steps = engine.ErodeBatch(view, local, p, bounds = bounds, stats = stats)
+    else:
+        steps = engine.Backend(p.drop_backend)(view, local, p, bounds = bounds, stats = stats)
+    return steps, stats and stats.summary()
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------- Tiled Erosion ----------------------------------------
+# ----------------------------------------------------------------------------------------------------
+def _round(shape, positions, tile_size, halo, offset):
+    # The tiles of a round & the drops starting in each of their cores
+    tiles = Tiles(shape, tile_size, halo, offset)
+    cells = np.rint(positions).astype(int)
+    tile_row = (np.minimum(cells[:, 0], shape[0] - 1) + offset) // tile_size
+    tile_col = (np.minimum(cells[:, 1], shape[1] - 1) + offset) // tile_size
+    per_row = -(-(shape[1] + offset) // tile_size)
+    owner = tile_row * per_row + tile_col
+    return tiles, [positions[owner == t] for t in range(len(tiles))]
+
+
+def Erode(heightmap, positions, p = param, processes = None, verbose = False, stats = None):
+    """
+    Erodes heightmap in place with a pool of processes, returning the total number of steps.
+    stats is an optional instrument.Recorder, fed the workers' timers (summed over processes) & counters.
+    """
+    p = settings.Namespace(p)
+    processes = processes or p.tile_processes or mp.cpu_count()
+    halo = max(p.tile_halo, p.erosion_radius + 1)
+    rounds = np.array_split(positions, p.tile_rounds)
+
+    shm = shared_memory.SharedMemory(create = True, size = heightmap.nbytes)
+    try:
+        shared = np.ndarray(heightmap.shape, dtype = heightmap.dtype, buffer = shm.buf)
+        shared[:] = heightmap
+        steps = 0
+        with mp.Pool(processes, _attach, (shm.name, heightmap.shape, heightmap.dtype, p, stats is not None)) as pool:
+            for k in range(p.tile_rounds):
+                tiles, drops = _round(heightmap.shape, rounds[k], p.tile_size, halo, k * p.tile_size // p.tile_rounds)
+                for colour in range(4):
+                    tasks = [(core, window, drops[t]) for t, (core, window, c) in enumerate(tiles)
+                        if c == colour and len(drops[t])]
+                    for tile_steps, summary in pool.map(_erode_tile, tasks, chunksize = 1):
+                        steps += tile_steps
+                        if summary:
+                            stats.merge(summary)
+                if verbose:
+                    print('round %d of %d' % (k + 1, p.tile_rounds))
+        heightmap[:] = shared
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+    return steps
+
+# ----------------------------------------------------------------------------------------------------
+# ----------------------------------------------------------------------------------------------------